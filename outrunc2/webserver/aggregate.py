@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Collapsing of identical command results reported by many clients"""
+import difflib
+import hashlib
+import itertools
+import json
+
+# The parts of a result that decide whether two clients produced "the same" output
+# (a spilled output is told apart by its blob reference, which is a content hash)
+OUTPUT_FIELDS = ('success', 'stdout', 'stderr', 'error', 'exit_code', 'timed_out', 'stdout_blob', 'stderr_blob')
+
+
+def as_result(result):
+    """A reported result as a dict: agents may post any JSON, which is kept as its stdout"""
+    if isinstance(result, dict):
+        return result
+    return {'stdout': result if isinstance(result, str) else json.dumps(result, default=str)}
+
+
+def result_digest(result):
+    """Stable hash of a result's output fields"""
+    canonical = json.dumps({key: result.get(key) for key in OUTPUT_FIELDS}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def _output_text(result):
+    output = result.get('stdout') or result.get('error') or result.get('stderr') or ''
+    return output if isinstance(output, str) else json.dumps(output, default=str)
+
+
+def group_results(results, diff=False, diff_max_lines=200):
+    """Group {client: result} by identical output, largest group first
+
+    Each group is {'digest', 'clients', 'count', 'result'} with a single copy
+    of the shared result. With diff=True every group but the largest also
+    gets 'diff': a unified diff of its output against the largest group's,
+    cut off after diff_max_lines lines.
+    """
+    groups = {}
+    for client, result in results.items():
+        result = as_result(result)
+        digest = result_digest(result)
+        group = groups.get(digest)
+        if group is None:
+            group = groups[digest] = {
+                'digest': digest,
+                'clients': [],
+                'result': {key: result[key] for key in OUTPUT_FIELDS if key in result}
+            }
+        group['clients'].append(client)
+
+    ordered = sorted(groups.values(), key=lambda group: len(group['clients']), reverse=True)
+    for group in ordered:
+        group['count'] = len(group['clients'])
+    if diff and len(ordered) > 1:
+        common = _output_text(ordered[0]['result']).splitlines()
+        for group in ordered[1:]:
+            lines = difflib.unified_diff(common, _output_text(group['result']).splitlines(),
+                                         'common', 'this group', lineterm='')
+            group['diff'] = '\n'.join(itertools.islice(lines, diff_max_lines))
+    return ordered
@@ -1,35 +1,152 @@
 #!/usr/bin/env python3
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
 import os
+import math
 import subprocess
 import json
 import socket
+import select
+import struct
 from datetime import datetime
 from ping3 import ping, verbose_ping
 import docker
 import time
 import threading
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+import uuid
+import fnmatch
+import zlib
+import gzip
+import io
+import tempfile
+import fcntl
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # zstd-encoded result uploads are refused with 415
+from result_store import ResultStore
+from event_log import EventLog
+from liveness import LivenessTracker
+from client_record import ClientRecord
+from broadcasts import Broadcast, BroadcastTracker
+from aggregate import group_results
+from blob_store import BlobStore
+from output_cache import OutputCache
+from ttl_cache import ttl_cache
+from metrics import Registry, InstrumentedLock, LOCK_BUCKETS
+from profiler import SamplingProfiler
+from feed import Broadcaster, sse_event
+from jobs import JobManager, JobQueueFull, JobCancelled
+from storage import SQLiteStorage
+from state_backend import InProcessBackend, SQLiteBackend
 
 app = Flask(__name__)
 
-# Connection monitoring storage
-connected_clients = {}  # client_id -> {info, last_seen, status}
-connection_events = []  # List of connection events with timestamps
-client_commands = defaultdict(list)  # client_id -> [commands]
-client_results = defaultdict(list)  # client_id -> [results]
-connections_lock = threading.Lock()
+# Instrumentation, exposed in Prometheus text format on /metrics
+metrics = Registry()
+request_seconds = metrics.histogram('c2_http_request_duration_seconds', 'HTTP request handling time',
+                                    ('route', 'method', 'status'))
+subprocess_spawned = metrics.counter('c2_subprocess_spawned_total', 'Child processes started', ('command',))
+subprocess_seconds = metrics.histogram('c2_subprocess_duration_seconds', 'Child process run time', ('command',))
+docker_api_seconds = metrics.histogram('c2_docker_api_duration_seconds', 'Docker Engine API call time', ('call',))
+ping_seconds = metrics.histogram('c2_ping_duration_seconds', 'Time spent in one ICMP ping (including timeouts)')
+lock_wait_seconds = metrics.histogram('c2_client_lock_wait_seconds', 'Time spent waiting for a client lock stripe',
+                                      buckets=LOCK_BUCKETS)
+lock_hold_seconds = metrics.histogram('c2_client_lock_hold_seconds', 'Time a client lock stripe was held',
+                                      buckets=LOCK_BUCKETS)
+
+def subprocess_name(argv):
+    """Metric label for a command line: the program, plus the subcommand for docker"""
+    return ' '.join(argv[:2]) if argv[0] == 'docker' else argv[0]
+
+# Connection monitoring state: registered agents (ClientRecords), their command queues,
+# reported results and connection events. STATE_BACKEND picks where it lives:
+#   memory - in this process (optionally persisted to STATE_DB); needs a single worker
+#   sqlite - in STATE_SHARED_DB, shared by every worker process on the host
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+LONGPOLL_MAX_WAIT = float(os.getenv('LONGPOLL_MAX_WAIT', '25'))  # cap on ?wait= for command long-polls
+
+def parse_wait(value):
+    """Seconds a request may block for, from a wait parameter, clamped to [0, LONGPOLL_MAX_WAIT]
+
+    Raises ValueError unless value is a finite number: a NaN timeout would
+    never expire.
+    """
+    wait_seconds = float(value)
+    if not math.isfinite(wait_seconds):
+        raise ValueError(f'wait must be finite, got {value!r}')
+    return min(max(wait_seconds, 0), LONGPOLL_MAX_WAIT)
+
+RESULT_LIMITS = {
+    'max_per_client': int(os.getenv('RESULTS_PER_CLIENT', '100')),
+    'max_total': int(os.getenv('RESULTS_MAX_TOTAL', '5000')),
+    'max_bytes': int(os.getenv('RESULTS_MAX_BYTES', str(64 * 1024 * 1024))),
+    'max_age': float(os.getenv('RESULTS_MAX_AGE', '86400'))
+}
+EVENT_LOG_SIZE = int(os.getenv('EVENT_LOG_SIZE', '1000'))
+BROADCAST_HISTORY = int(os.getenv('BROADCAST_HISTORY', '100'))  # broadcasts kept for result aggregation
+STATE_POLL_INTERVAL = float(os.getenv('STATE_POLL_INTERVAL', '0.1'))  # sqlite backend: seconds between checks for other workers' changes
+
+def new_client_lock():
+    return InstrumentedLock(lock_wait_seconds, lock_hold_seconds)
+
+# Optional durable storage for the memory backend: set STATE_DB to a SQLite file path to survive restarts
+STATE_DB = os.getenv('STATE_DB', '') if STATE_BACKEND != 'sqlite' else ''
+state_db = SQLiteStorage(
+    STATE_DB,
+    flush_interval=float(os.getenv('STATE_DB_FLUSH_INTERVAL', '1')),
+    retention=RESULT_LIMITS['max_age']
+) if STATE_DB else None
+
+if STATE_BACKEND == 'sqlite':
+    STATE_SHARED_DB = os.getenv('STATE_SHARED_DB', os.path.join(tempfile.gettempdir(), 'c2-state.db'))
+    state = SQLiteBackend(
+        STATE_SHARED_DB,
+        new_client_lock,
+        poll_interval=STATE_POLL_INTERVAL,
+        event_capacity=EVENT_LOG_SIZE,
+        broadcast_history=BROADCAST_HISTORY,
+        **RESULT_LIMITS
+    )
+    print(f"[*] Shared state in {STATE_SHARED_DB}: {state.client_count()} clients registered")
+else:
+    state = InProcessBackend(
+        # client_id/command_id -> results, bounded by count, bytes and age
+        ResultStore(**RESULT_LIMITS),
+        # Ring buffer of connection events, each with a sequence number for ?since= fetches
+        EventLog(capacity=EVENT_LOG_SIZE),
+        # Recent broadcasts and the results reported for them
+        BroadcastTracker(history=BROADCAST_HISTORY),
+        new_client_lock,
+        stripes=int(os.getenv('LOCK_STRIPES', '64')),
+        storage=state_db
+    )
+    if state_db:
+        restored_clients, restored_commands, restored_results = state.restore()
+        print(f"[*] Restored {restored_clients} clients, {restored_commands} queued commands "
+              f"and {restored_results} results from {STATE_DB}")
+
+LAST_SEEN_RESOLUTION = 30  # seconds; last_seen-only updates are published at most this often
+
+# Command execution settings
+COMMAND_TIMEOUT = float(os.getenv('COMMAND_TIMEOUT', '30'))  # per-target timeout (seconds)
+FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', '8'))  # max containers exec'd in parallel
+EXEC_BACKEND = os.getenv('EXEC_BACKEND', 'api')  # 'api' (Docker Engine API) or 'cli' (docker exec)
+fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix='fanout')
 
 # Initialize Docker client
+# The connection pool is sized so every fan-out worker can hold its own keep-alive connection
 try:
     # Try to connect to Docker using the Unix socket directly
-    docker_client = docker.DockerClient(base_url='unix://var/run/docker.sock')
+    docker_client = docker.DockerClient(base_url='unix://var/run/docker.sock',
+                                        max_pool_size=FANOUT_MAX_WORKERS)
     # Test the connection
     docker_client.ping()
 except Exception as e:
     try:
         # Fallback to default from_env method
-        docker_client = docker.from_env()
+        docker_client = docker.from_env(max_pool_size=FANOUT_MAX_WORKERS)
         docker_client.ping()
     except Exception as e2:
         docker_client = None
@@ -42,12 +159,113 @@ CLIENT_CONTAINERS = {
     'endpoint3': 'linux_endpoint3'
 }
 
-def execute_command_on_client(container_name, command):
-    """Execute a command on a specific client container"""
+
+def run_process(argv, timeout, cancel=None):
+    """Run a local process to completion, killing it on timeout or when cancel is set"""
+    with subprocess_seconds.time(command=subprocess_name(argv)):
+        subprocess_spawned.inc(command=subprocess_name(argv))
+        return _run_process(argv, timeout, cancel)
+
+def _run_process(argv, timeout, cancel):
+    process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # Wake up periodically so a cancelled job doesn't wait out its timeout
+            stdout, stderr = process.communicate(timeout=min(max(deadline - time.monotonic(), 0), 0.5))
+            break
+        except subprocess.TimeoutExpired:
+            if cancel is not None and cancel.is_set():
+                process.kill()
+                process.communicate()
+                raise JobCancelled()
+            if time.monotonic() >= deadline:
+                process.kill()
+                process.communicate()
+                raise
+    return subprocess.CompletedProcess(argv, process.returncode, stdout, stderr)
+
+def _iter_exec_frames(sock, timeout, cancel=None):
+    """Yield (stream_id, bytes) frames from a multiplexed exec stream as they arrive
+
+    Raises TimeoutError once timeout seconds have passed.
+    """
+    # Docker frames each chunk as: 1 byte stream id, 3 padding bytes, 4 byte big-endian length
+    deadline = time.monotonic() + timeout
+    buffer = bytearray()
+    while True:
+        remaining = deadline - time.monotonic()
+        if cancel is not None:
+            if cancel.is_set():
+                raise JobCancelled()
+            remaining = min(remaining, 0.5)
+        if remaining <= 0:
+            raise TimeoutError
+        if not select.select([sock], [], [], remaining)[0]:
+            continue
+        chunk = sock.recv(65536) if hasattr(sock, 'recv') else sock.read(65536)
+        if not chunk:
+            return
+        buffer += chunk
+        while len(buffer) >= 8:
+            stream_id, length = struct.unpack('>BxxxL', buffer[:8])
+            if len(buffer) < 8 + length:
+                break
+            yield stream_id, bytes(buffer[8:8 + length])
+            del buffer[:8 + length]
+
+def _read_exec_output(sock, timeout, cancel=None):
+    """Read a multiplexed exec stream into (stdout, stderr) bytes, giving up after timeout seconds"""
+    streams = {1: bytearray(), 2: bytearray()}
+    for stream_id, data in _iter_exec_frames(sock, timeout, cancel):
+        streams.get(stream_id, streams[1]).extend(data)
+    return bytes(streams[1]), bytes(streams[2])
+
+def execute_command_via_api(container_name, command, timeout=COMMAND_TIMEOUT, cancel=None):
+    """Execute a command on a client container over the pooled Docker Engine API connection"""
+    api = docker_client.api
+    try:
+        with docker_api_seconds.time(call='exec'):
+            exec_id = api.exec_create(container_name, ['sh', '-c', command])['Id']
+            sock = api.exec_start(exec_id, socket=True)
+            try:
+                stdout, stderr = _read_exec_output(sock, timeout, cancel)
+            finally:
+                sock.close()
+            exit_code = api.exec_inspect(exec_id)['ExitCode']
+    except TimeoutError:
+        return {'success': False, 'timed_out': True, 'error': f'Command timed out after {timeout:g} seconds'}
+    except docker.errors.NotFound:
+        return {'success': False, 'error': f'No such container: {container_name}'}
+    except docker.errors.APIError as e:
+        return {'success': False, 'error': e.explanation or str(e)}
+
+    return {
+        'success': exit_code == 0,
+        'exit_code': exit_code,
+        'stdout': stdout.decode('utf-8', errors='replace'),
+        'stderr': stderr.decode('utf-8', errors='replace')
+    }
+
+def execute_command_on_client(container_name, command, timeout=COMMAND_TIMEOUT, cancel=None):
+    """Execute a command on a specific client container
+
+    cancel is an optional threading.Event; once set the exec is abandoned
+    and JobCancelled is raised.
+    """
+    if EXEC_BACKEND == 'api' and docker_client is not None:
+        try:
+            return execute_command_via_api(container_name, command, timeout, cancel)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            # Daemon unreachable over the API - fall back to the docker CLI below
+            print(f"Warning: Docker API exec failed, falling back to CLI: {e}")
+
     try:
         # Use docker exec directly via subprocess as a more reliable method
         cmd = ['docker', 'exec', container_name, 'sh', '-c', command]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        result = run_process(cmd, timeout, cancel)
         
         return {
             'success': result.returncode == 0,
@@ -57,112 +275,336 @@ def execute_command_on_client(container_name, command):
         }
         
     except subprocess.TimeoutExpired:
-        return {'success': False, 'error': 'Command timed out after 30 seconds'}
+        return {'success': False, 'timed_out': True, 'error': f'Command timed out after {timeout:g} seconds'}
     except FileNotFoundError:
         return {'success': False, 'error': 'Docker command not found'}
+    except JobCancelled:
+        raise
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def get_client_status():
-    """Get status of all client containers"""
-    clients = {}
-    for client_name, container_name in CLIENT_CONTAINERS.items():
+def execute_command_on_clients(containers, command, timeout=COMMAND_TIMEOUT, cancel=None):
+    """Execute a command on several client containers concurrently
+
+    containers maps client name -> container name. At most FANOUT_MAX_WORKERS
+    execs run at once. Targets still running or queued when the batch deadline
+    passes are reported as timed out, so one slow container only costs its own
+    slot and the caller always gets back whatever did finish.
+    """
+    futures = {
+        fanout_executor.submit(execute_command_on_client, container_name, command, timeout, cancel): client_name
+        for client_name, container_name in containers.items()
+    }
+    # Allow queued targets one extra timeout window to get a worker before giving up on them
+    waves = -(-len(futures) // FANOUT_MAX_WORKERS) if futures else 0
+    done, not_done = wait(futures, timeout=timeout * max(waves, 1) + 1)
+
+    results = {}
+    for future, client_name in futures.items():
+        if future in done:
+            try:
+                results[client_name] = future.result()
+            except JobCancelled:
+                results[client_name] = {'success': False, 'cancelled': True, 'error': 'Command cancelled'}
+        else:
+            future.cancel()
+            results[client_name] = {'success': False, 'timed_out': True,
+                                    'error': f'Command timed out after {timeout:g} seconds'}
+    return results
+
+def stream_command_on_client(container_name, command, timeout=COMMAND_TIMEOUT):
+    """Yield ('stdout' | 'stderr', bytes) chunks from a client command as it runs, then ('exit', code)
+
+    Raises TimeoutError if the command runs longer than timeout. Closing the
+    generator early abandons the exec (the socket is closed / the CLI killed).
+    """
+    if EXEC_BACKEND == 'api' and docker_client is not None:
+        api = docker_client.api
+        sock = None
+        started = time.perf_counter()
         try:
-            # Use docker inspect to get container info
-            cmd = ['docker', 'inspect', container_name]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                import json
-                container_info = json.loads(result.stdout)[0]
-                
-                # Get container state
-                state = container_info['State']
-                running = state.get('Running', False)
-                status = 'running' if running else state.get('Status', 'unknown')
-                
-                # Get IP address
-                networks = container_info['NetworkSettings']['Networks']
-                ip_address = 'N/A'
-                if networks:
-                    # Try to find lab_network first, then any network
-                    for network_name, network_info in networks.items():
-                        if 'lab_network' in network_name and network_info.get('IPAddress'):
-                            ip_address = network_info['IPAddress']
-                            break
-                        elif network_info.get('IPAddress'):
-                            ip_address = network_info['IPAddress']
-                
-                clients[client_name] = {
-                    'container_name': container_name,
-                    'status': status,
-                    'running': running,
-                    'ip_address': ip_address
-                }
-            else:
-                clients[client_name] = {
-                    'container_name': container_name,
-                    'status': 'not_found',
-                    'running': False,
-                    'ip_address': 'N/A'
-                }
+            exec_id = api.exec_create(container_name, ['sh', '-c', command])['Id']
+            sock = api.exec_start(exec_id, socket=True)
+        except docker.errors.APIError:
+            raise
         except Exception as e:
-            clients[client_name] = {
-                'container_name': container_name,
-                'status': f'error: {str(e)}',
-                'running': False,
-                'ip_address': 'N/A'
-            }
-    
+            # Daemon unreachable over the API - fall back to the docker CLI below
+            print(f"Warning: Docker API exec failed, falling back to CLI: {e}")
+        if sock is not None:
+            try:
+                try:
+                    for stream_id, data in _iter_exec_frames(sock, timeout):
+                        yield ('stderr' if stream_id == 2 else 'stdout'), data
+                finally:
+                    sock.close()
+                yield 'exit', api.exec_inspect(exec_id)['ExitCode']
+            finally:
+                docker_api_seconds.observe(time.perf_counter() - started, call='exec_stream')
+            return
+
+    subprocess_spawned.inc(command='docker exec')
+    started = time.perf_counter()
+    process = subprocess.Popen(['docker', 'exec', container_name, 'sh', '-c', command],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + timeout
+    names = {process.stdout: 'stdout', process.stderr: 'stderr'}
+    try:
+        open_pipes = list(names)
+        while open_pipes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            for pipe in select.select(open_pipes, [], [], remaining)[0]:
+                data = os.read(pipe.fileno(), 65536)
+                if data:
+                    yield names[pipe], data
+                else:
+                    open_pipes.remove(pipe)
+        yield 'exit', process.wait(timeout=max(deadline - time.monotonic(), 0.1))
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+        subprocess_seconds.observe(time.perf_counter() - started, command='docker exec')
+
+# ==== CONTAINER STATUS CACHE ====
+# client_name -> status dict, kept current by a background Docker events watcher
+container_status = {}
+container_status_lock = threading.Lock()
+CONTAINER_STATUS_POLL = float(os.getenv('CONTAINER_STATUS_POLL', '30'))  # resync interval without the API
+
+def _container_status_entry(container_name, status='not_found', running=False, networks=None, container_id=None):
+    """Build the status dict reported for one client container"""
+    # Try to find lab_network first, then any network
+    ip_address = 'N/A'
+    for network_name, network_info in (networks or {}).items():
+        if 'lab_network' in network_name and network_info.get('IPAddress'):
+            ip_address = network_info['IPAddress']
+            break
+        elif network_info.get('IPAddress'):
+            ip_address = network_info['IPAddress']
+
+    return {
+        'container_name': container_name,
+        'container_id': container_id,
+        'status': status,
+        'running': running,
+        'ip_address': ip_address
+    }
+
+def _container_status_from_inspect(container_name, container_info):
+    """Convert `docker inspect` output for one container into a status entry"""
+    state = container_info['State']
+    running = state.get('Running', False)
+    return _container_status_entry(
+        container_name,
+        status='running' if running else state.get('Status', 'unknown'),
+        running=running,
+        networks=container_info['NetworkSettings']['Networks'],
+        container_id=container_info.get('Id')
+    )
+
+def load_container_status():
+    """Fetch the status of every client container with a single bulk call"""
+    clients = {name: _container_status_entry(container) for name, container in CLIENT_CONTAINERS.items()}
+    by_container = {container: name for name, container in CLIENT_CONTAINERS.items()}
+
+    if docker_client is not None:
+        # One list call covers all containers; the API reports names with a leading slash
+        with docker_api_seconds.time(call='containers'):
+            containers = docker_client.api.containers(all=True)
+        for container in containers:
+            for container_name in container.get('Names', []):
+                client_name = by_container.get(container_name.lstrip('/'))
+                if client_name:
+                    clients[client_name] = _container_status_entry(
+                        container_name.lstrip('/'),
+                        status=container.get('State', 'unknown'),
+                        running=container.get('State') == 'running',
+                        networks=container.get('NetworkSettings', {}).get('Networks'),
+                        container_id=container.get('Id')
+                    )
+        return clients
+
+    # No API connection - inspect all containers in one CLI call. Missing containers make
+    # docker exit non-zero but the ones it did find are still printed.
+    subprocess_spawned.inc(command='docker inspect')
+    with subprocess_seconds.time(command='docker inspect'):
+        result = subprocess.run(['docker', 'inspect'] + list(by_container), capture_output=True, text=True)
+    for container_info in json.loads(result.stdout or '[]'):
+        container_name = container_info.get('Name', '').lstrip('/')
+        if container_name in by_container:
+            clients[by_container[container_name]] = _container_status_from_inspect(container_name, container_info)
     return clients
 
-def get_system_info():
-    """Get basic system information"""
+def refresh_container_status():
+    """Reload the whole container status cache"""
     try:
-        # Get hostname
-        try:
-            hostname = subprocess.check_output(['hostname'], text=True).strip()
-        except:
-            hostname = socket.gethostname()
-        
-        # Get IP addresses with fallback methods
-        ip_info = ""
+        clients = load_container_status()
+    except Exception as e:
+        clients = {
+            name: _container_status_entry(container, status=f'error: {str(e)}')
+            for name, container in CLIENT_CONTAINERS.items()
+        }
+    with container_status_lock:
+        container_status.clear()
+        container_status.update(clients)
+
+def update_container_status(container_ref):
+    """Re-inspect a single container (by name or id) after an event and update its cache entry"""
+    try:
+        with docker_api_seconds.time(call='inspect_container'):
+            container_info = docker_client.api.inspect_container(container_ref)
+        container_name = container_info['Name'].lstrip('/')
+        entry = _container_status_from_inspect(container_name, container_info)
+    except docker.errors.NotFound:
+        # Removed containers can only be matched by name
+        container_name = container_ref
+        entry = _container_status_entry(container_name)
+
+    client_name = next((n for n, c in CLIENT_CONTAINERS.items() if c == container_name), None)
+    if client_name is not None:
+        with container_status_lock:
+            container_status[client_name] = entry
+
+CONTAINER_EVENT_ACTIONS = ('start', 'die', 'stop', 'destroy', 'pause', 'unpause', 'rename')
+NETWORK_EVENT_ACTIONS = ('connect', 'disconnect')
+
+def _watched_container_ids():
+    """Ids of the client containers as last seen by the status cache"""
+    with container_status_lock:
+        return {info['container_id'] for info in container_status.values() if info.get('container_id')}
+
+def watch_container_events():
+    """Keep the container status cache current from the Docker events stream"""
+    while True:
+        if docker_client is None:
+            # No events stream without the API - fall back to periodic bulk resyncs
+            time.sleep(CONTAINER_STATUS_POLL)
+            refresh_container_status()
+            continue
         try:
-            ip_info = subprocess.check_output(['ip', 'addr', 'show'], text=True)
-        except FileNotFoundError:
-            try:
-                # Fallback to ifconfig
-                ip_info = subprocess.check_output(['ifconfig'], text=True)
-            except FileNotFoundError:
-                # Simple socket-based approach
-                try:
-                    # Get container's IP by connecting to external host
-                    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                    s.connect(("8.8.8.8", 80))
-                    local_ip = s.getsockname()[0]
-                    s.close()
-                    ip_info = f"Container IP: {local_ip}\nHostname IP: {socket.gethostbyname(hostname)}"
-                except Exception as sock_e:
-                    ip_info = f"Network interface info unavailable: {str(sock_e)}"
+            # Only state changes are worth an inspect - exec_*, health_status and the like
+            # fire constantly on a busy lab. The container filter can't be pushed to the
+            # daemon as well: it matches the event's actor, which for connect/disconnect
+            # is the network, so the client containers are picked out below instead.
+            events = docker_client.events(decode=True, filters={
+                'type': ['container', 'network'],
+                'event': list(CONTAINER_EVENT_ACTIONS + NETWORK_EVENT_ACTIONS)
+            })
+            # Resync once subscribed so nothing that happened before the subscription is missed
+            refresh_container_status()
+            watched_names = set(CLIENT_CONTAINERS.values())
+            for event in events:
+                actor = event.get('Actor', {})
+                attributes = actor.get('Attributes', {})
+                if event.get('Type') == 'network':
+                    # Network events carry the container id, which the cache already knows
+                    container_id = attributes.get('container')
+                    if container_id in _watched_container_ids():
+                        update_container_status(container_id)
+                    continue
+
+                container_refs = [ref for ref in (attributes.get('oldName', '').lstrip('/'), attributes.get('name'))
+                                  if ref in watched_names]
+                if not container_refs:
+                    continue
+                if event.get('Action') in ('start', 'die', 'destroy'):
+                    # A restarted container keeps its id; its cached command output doesn't survive
+                    output_cache.invalidate(actor.get('ID'))
+                # A rename reports the new name and the old one; both cache entries may change
+                for container_ref in container_refs:
+                    update_container_status(container_ref)
         except Exception as e:
-            ip_info = f"IP lookup error: {str(e)}"
-        
-        # Get uptime
+            print(f"Warning: Docker events stream lost, resyncing: {e}")
+            time.sleep(5)
+
+def get_client_status():
+    """Get status of all client containers from the in-memory cache"""
+    with container_status_lock:
+        return {name: dict(info) for name, info in container_status.items()}
+
+refresh_container_status()
+threading.Thread(target=watch_container_events, name='container-events', daemon=True).start()
+
+# Hostname and interfaces rarely change: read them at most once per SYSTEM_INFO_TTL
+# (GET /api/system?refresh=1 drops the cached values)
+SYSTEM_INFO_TTL = float(os.getenv('SYSTEM_INFO_TTL', '300'))
+SIOCGIFADDR = 0x8915  # ioctl for an interface's IPv4 address
+
+@ttl_cache(SYSTEM_INFO_TTL)
+def get_hostname():
+    """Server hostname"""
+    return socket.gethostname()
+
+@ttl_cache(SYSTEM_INFO_TTL)
+def get_interfaces():
+    """Network interfaces in an `ip addr`-like text form, from /proc/net and ioctls (no child processes)"""
+    ipv6 = defaultdict(list)
+    try:
+        # address, ifindex, prefix length, scope, flags, name
+        with open('/proc/net/if_inet6') as f:
+            for line in f:
+                address, _, prefix, _, _, name = line.split()
+                address = socket.inet_ntop(socket.AF_INET6, bytes.fromhex(address))
+                ipv6[name].append(f"{address}/{int(prefix, 16)}")
+    except OSError:
+        pass
+    
+    try:
+        with open('/proc/net/dev') as f:
+            lines = f.readlines()[2:]  # two header lines
+    except OSError:
+        # No procfs: fall back to the address used for outbound traffic
         try:
-            uptime = subprocess.check_output(['uptime'], text=True).strip()
-        except FileNotFoundError:
-            # Read from /proc/uptime if available
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect(("8.8.8.8", 80))
+                return f"Container IP: {s.getsockname()[0]}"
+        except Exception as e:
+            return f"Network interface info unavailable: {str(e)}"
+    
+    blocks = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        for index, line in enumerate(lines, 1):
+            name = line.split(':', 1)[0].strip()
+            block = [f"{index}: {name}"]
             try:
-                with open('/proc/uptime', 'r') as f:
-                    uptime_seconds = float(f.read().split()[0])
-                    uptime = f"up {uptime_seconds/3600:.1f} hours"
-            except:
-                uptime = "uptime command not available"
-        
+                request_data = struct.pack('256s', name.encode()[:15])
+                address = socket.inet_ntoa(fcntl.ioctl(s.fileno(), SIOCGIFADDR, request_data)[20:24])
+                block.append(f"    inet {address}")
+            except OSError:
+                pass  # no IPv4 address
+            block.extend(f"    inet6 {address}" for address in ipv6.get(name, ()))
+            blocks.append("\n".join(block))
+    return "\n".join(blocks)
+
+def get_uptime():
+    """Uptime and load averages in the style of `uptime`, from /proc"""
+    try:
+        with open('/proc/uptime') as f:
+            seconds = int(float(f.read().split()[0]))
+    except OSError:
+        return "uptime not available"
+    days, rest = divmod(seconds, 86400)
+    hours, minutes = divmod(rest // 60, 60)
+    uptime = f"up {days} day{'s' if days != 1 else ''}, {hours}:{minutes:02d}" if days else f"up {hours}:{minutes:02d}"
+    try:
+        with open('/proc/loadavg') as f:
+            load = f.read().split()[:3]
+        uptime += f", load average: {', '.join(load)}"
+    except OSError:
+        pass
+    return f"{datetime.now().strftime('%H:%M:%S')} {uptime}"
+
+def get_system_info():
+    """Get basic system information"""
+    try:
         return {
-            'hostname': hostname,
-            'ip_info': ip_info,
-            'uptime': uptime,
+            'hostname': get_hostname(),
+            'ip_info': get_interfaces(),
+            'uptime': get_uptime(),
             'timestamp': datetime.now().isoformat()
         }
     except Exception as e:
@@ -171,86 +613,254 @@ def get_system_info():
             'timestamp': datetime.now().isoformat()
         }
 
-def ping_endpoints():
-    """Test connectivity to other endpoints in the lab network using ICMP ping"""
-    endpoints = {
-        '192.168.210.10': 'linux_endpoint1 (Alpine)',
-        '192.168.210.11': 'linux_endpoint2 (Alpine)', 
-        '192.168.210.12': 'linux_endpoint3 (Alpine)'
-    }
-    results = {}
+# ==== ENDPOINT REACHABILITY PROBER ====
+PROBE_INTERVAL = float(os.getenv('PROBE_INTERVAL', '30'))  # seconds between probe rounds
+PROBE_COUNT = int(os.getenv('PROBE_COUNT', '3'))  # ICMP packets per host per round
+PROBE_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', '2'))  # per-packet timeout (seconds)
+PROBE_HISTORY = int(os.getenv('PROBE_HISTORY', '20'))  # rounds of RTT/loss history kept per host
+# Optional explicit host list: "192.168.210.10=linux_endpoint1 (Alpine),10.0.0.5=router"
+PROBE_HOSTS = os.getenv('PROBE_HOSTS', '')
+
+probe_results = {}  # host -> latest probe result
+probe_history = defaultdict(lambda: deque(maxlen=PROBE_HISTORY))  # host -> deque of rounds
+probe_lock = threading.Lock()
+
+def get_probe_targets():
+    """Hosts to probe: PROBE_HOSTS if configured, otherwise the client containers"""
+    if PROBE_HOSTS:
+        targets = {}
+        for entry in PROBE_HOSTS.split(','):
+            host, _, description = entry.strip().partition('=')
+            if host:
+                targets[host] = description or host
+        return targets
+
+    # Use the cached container IPs, or the container name (resolvable on the lab network)
+    targets = {}
+    for client_name, info in get_client_status().items():
+        host = info['ip_address'] if info['ip_address'] != 'N/A' else info['container_name']
+        targets[host] = info['container_name']
+    return targets
+
+def probe_endpoint(endpoint, description):
+    """Test connectivity to one endpoint using ICMP ping, falling back to a TCP connect"""
+    output_lines = [f"ICMP Ping to {description}"]
+    success = False
+    ping_times = []
     
-    for endpoint, description in endpoints.items():
-        output_lines = [f"ICMP Ping to {description}"]
-        success = False
+    try:
+        # Send PROBE_COUNT ICMP ping packets
+        for i in range(PROBE_COUNT):
+            with ping_seconds.time():
+                response_time = ping(endpoint, timeout=PROBE_TIMEOUT)
+            if response_time:
+                ping_times.append(response_time * 1000)  # Convert to milliseconds
+            else:
+                ping_times.append(None)
         
-        try:
-            # Send 3 ICMP ping packets
-            ping_times = []
-            for i in range(3):
-                response_time = ping(endpoint, timeout=2)
-                if response_time is not None:
-                    ping_times.append(response_time * 1000)  # Convert to milliseconds
-                else:
-                    ping_times.append(None)
+        # Check results
+        successful_pings = [t for t in ping_times if t is not None]
+        
+        if successful_pings:
+            success = True
+            avg_time = sum(successful_pings) / len(successful_pings)
+            min_time = min(successful_pings)
+            max_time = max(successful_pings)
+            packet_loss = ((PROBE_COUNT - len(successful_pings)) / PROBE_COUNT) * 100
+            
+            output_lines.append(f"✓ {endpoint} is reachable")
+            output_lines.append(f"   Packets: {PROBE_COUNT} sent, {len(successful_pings)} received, {packet_loss:.0f}% loss")
+            output_lines.append(f"   RTT: min={min_time:.1f}ms, avg={avg_time:.1f}ms, max={max_time:.1f}ms")
+        else:
+            output_lines.append(f"✗ {endpoint} is unreachable")
+            output_lines.append(f"   All {PROBE_COUNT} ICMP packets lost")
             
-            # Check results
-            successful_pings = [t for t in ping_times if t is not None]
+    except PermissionError:
+        # ICMP requires root privileges, fall back to socket test
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(PROBE_TIMEOUT)
+            result = sock.connect_ex((endpoint, 22))
+            sock.close()
             
-            if successful_pings:
+            if result in [0, 111]:  # Connected or connection refused (both mean reachable)
                 success = True
-                avg_time = sum(successful_pings) / len(successful_pings)
-                min_time = min(successful_pings)
-                max_time = max(successful_pings)
-                packet_loss = ((3 - len(successful_pings)) / 3) * 100
-                
-                output_lines.append(f"✓ {endpoint} is reachable")
-                output_lines.append(f"   Packets: 3 sent, {len(successful_pings)} received, {packet_loss:.0f}% loss")
-                output_lines.append(f"   RTT: min={min_time:.1f}ms, avg={avg_time:.1f}ms, max={max_time:.1f}ms")
+                output_lines.append(f"✓ {endpoint} is reachable (TCP test)")
+                output_lines.append("   Note: ICMP requires root privileges")
             else:
-                output_lines.append(f"✗ {endpoint} is unreachable")
-                output_lines.append(f"   All 3 ICMP packets lost")
-                
-        except PermissionError:
-            # ICMP requires root privileges, fall back to socket test
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(2)
-                result = sock.connect_ex((endpoint, 22))
-                sock.close()
-                
-                if result in [0, 111]:  # Connected or connection refused (both mean reachable)
-                    success = True
-                    output_lines.append(f"✓ {endpoint} is reachable (TCP test)")
-                    output_lines.append("   Note: ICMP requires root privileges")
-                else:
-                    output_lines.append(f"✗ {endpoint} appears unreachable")
-                    output_lines.append(f"   TCP connection failed (code: {result})")
-            except Exception as e:
-                output_lines.append(f"✗ Network test failed: {str(e)}")
-                
+                output_lines.append(f"✗ {endpoint} appears unreachable")
+                output_lines.append(f"   TCP connection failed (code: {result})")
         except Exception as e:
-            output_lines.append(f"✗ ICMP ping failed: {str(e)}")
-            # Fallback to socket test
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(2)
-                result = sock.connect_ex((endpoint, 22))
-                sock.close()
-                
-                if result in [0, 111]:
-                    success = True
-                    output_lines.append(f"✓ {endpoint} reachable via TCP fallback")
-            except:
-                pass
-        
-        results[endpoint] = {
-            'success': success,
-            'output': '\n'.join(output_lines)
+            output_lines.append(f"✗ Network test failed: {str(e)}")
+            
+    except Exception as e:
+        output_lines.append(f"✗ ICMP ping failed: {str(e)}")
+        # Fallback to socket test
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(PROBE_TIMEOUT)
+            result = sock.connect_ex((endpoint, 22))
+            sock.close()
+            
+            if result in [0, 111]:
+                success = True
+                output_lines.append(f"✓ {endpoint} reachable via TCP fallback")
+        except:
+            pass
+    
+    return {
+        'success': success,
+        'output': '\n'.join(output_lines),
+        'rtts': [t for t in ping_times if t is not None],
+        'sent': len(ping_times)
+    }
+
+def _record_probe(endpoint, description, probe):
+    """Store a probe round and summarise the host's rolling RTT/loss history"""
+    with probe_lock:
+        history = probe_history[endpoint]
+        history.append({'timestamp': time.time(), 'rtts': probe['rtts'], 'sent': probe['sent']})
+        sent = sum(h['sent'] for h in history)
+        rtts = [t for h in history for t in h['rtts']]
+        probe_results[endpoint] = {
+            'description': description,
+            'success': probe['success'],
+            'output': probe['output'],
+            'timestamp': datetime.now().isoformat(),
+            'history': {
+                'rounds': len(history),
+                'loss_percent': round((sent - len(rtts)) / sent * 100, 1) if sent else None,
+                'avg_rtt_ms': round(sum(rtts) / len(rtts), 1) if rtts else None,
+                'max_rtt_ms': round(max(rtts), 1) if rtts else None,
+                'rtt_ms': [round(sum(h['rtts']) / len(h['rtts']), 1) if h['rtts'] else None for h in history]
+            }
         }
+
+def run_probe_round():
+    """Probe every target host concurrently and record the results"""
+    targets = get_probe_targets()
+    if not targets:
+        return
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix='probe') as pool:
+        futures = {pool.submit(probe_endpoint, host, description): (host, description)
+                   for host, description in targets.items()}
+        for future, (host, description) in futures.items():
+            _record_probe(host, description, future.result())
+
+    # Forget hosts that are no longer targeted
+    with probe_lock:
+        for host in set(probe_results) - set(targets):
+            probe_results.pop(host, None)
+            probe_history.pop(host, None)
+
+def probe_loop():
+    """Background prober: run a probe round every PROBE_INTERVAL seconds"""
+    while True:
+        started = time.monotonic()
+        try:
+            run_probe_round()
+        except Exception as e:
+            print(f"Warning: endpoint probe round failed: {e}")
+        time.sleep(max(0, PROBE_INTERVAL - (time.monotonic() - started)))
+
+def ping_endpoints():
+    """Latest connectivity snapshot for the lab endpoints (probed in the background)"""
+    with probe_lock:
+        results = {host: dict(result) for host, result in probe_results.items()}
+    for host, description in get_probe_targets().items():
+        results.setdefault(host, {
+            'description': description,
+            'success': False,
+            'output': f"ICMP Ping to {description}\n… probe pending"
+        })
+    return results
+
+threading.Thread(target=probe_loop, name='endpoint-prober', daemon=True).start()
+
+# Catalog of whitelisted commands: the shell command run in client containers, the argv
+# run on the server (None: clients only), and how long its output may be served from the
+# per-container cache - None for volatile commands, which always execute
+COMMAND_CATALOG = {
+    'whoami':              {'client': 'whoami',              'server': ['whoami'],              'ttl': 3600},
+    'pwd':                 {'client': 'pwd',                 'server': ['pwd'],                 'ttl': 3600},
+    'ls':                  {'client': 'ls -la',              'server': ['ls', '-la'],           'ttl': None},
+    'date':                {'client': 'date',                'server': ['date'],                'ttl': None},
+    'uptime':              {'client': 'uptime',              'server': ['uptime'],              'ttl': None},
+    'ip addr':             {'client': 'ip addr show',        'server': ['ip', 'addr', 'show'],  'ttl': 60},
+    'ps':                  {'client': 'ps aux',              'server': ['ps', 'aux'],           'ttl': None},
+    'df':                  {'client': 'df -h',               'server': ['df', '-h'],            'ttl': None},
+    'free':                {'client': 'free -h',             'server': ['free', '-h'],          'ttl': None},
+    'cat /etc/os-release': {'client': 'cat /etc/os-release', 'server': None,                    'ttl': 86400},
+    'hostname':            {'client': 'hostname',            'server': None,                    'ttl': 3600},
+    'id':                  {'client': 'id',                  'server': None,                    'ttl': 3600},
+    'env':                 {'client': 'env',                 'server': None,                    'ttl': 3600},
+    'which python3':       {'client': 'which python3',       'server': None,                    'ttl': 86400},
+    'python3 --version':   {'client': 'python3 --version',   'server': None,                    'ttl': 86400},
+    'ping -c 3 8.8.8.8':   {'client': 'ping -c 3 8.8.8.8',   'server': None,                    'ttl': None},
+    'netstat -tuln':       {'client': 'netstat -tuln',       'server': None,                    'ttl': None}
+}
+
+# Whitelists derived from the catalog, built once
+CLIENT_SAFE_COMMANDS = {name: entry['client'] for name, entry in COMMAND_CATALOG.items()}
+SERVER_SAFE_COMMANDS = {name: entry['server'] for name, entry in COMMAND_CATALOG.items() if entry['server']}
+
+# Output of idempotent catalog commands per container id; OUTPUT_CACHE=0 disables it
+OUTPUT_CACHE_ENABLED = os.getenv('OUTPUT_CACHE', '1') == '1'
+output_cache = OutputCache(max_entries=int(os.getenv('OUTPUT_CACHE_SIZE', '1024')))
+
+def execute_catalog_command(containers, command, timeout=COMMAND_TIMEOUT, cancel=None):
+    """Run a catalog command on client containers (client name -> container name)
+
+    Idempotent commands are answered from the output cache for containers
+    whose current id has a fresh entry; only the rest are exec'd, and their
+    successful output is cached for the command's TTL.
+    """
+    ttl = COMMAND_CATALOG[command]['ttl'] if OUTPUT_CACHE_ENABLED else None
+    with container_status_lock:
+        container_ids = {name: info.get('container_id') if info.get('running') else None
+                         for name, info in ((name, container_status.get(name, {})) for name in containers)}
+    
+    results, misses = {}, {}
+    for client_name, container_name in containers.items():
+        cached = output_cache.get(container_ids[client_name], command) if ttl and container_ids[client_name] else None
+        if cached is not None:
+            results[client_name] = cached
+        else:
+            misses[client_name] = container_name
     
+    shell_command = COMMAND_CATALOG[command]['client']
+    if len(misses) == 1:
+        client_name, container_name = next(iter(misses.items()))
+        fresh = {client_name: execute_command_on_client(container_name, shell_command, timeout, cancel)}
+    else:
+        fresh = execute_command_on_clients(misses, shell_command, timeout, cancel) if misses else {}
+    for client_name, result in fresh.items():
+        if ttl and container_ids[client_name] and result.get('success'):
+            output_cache.put(container_ids[client_name], command, result, ttl)
+        results[client_name] = result
     return results
 
+SERVER_COMMAND_TIMEOUT = 10
+
+def execute_server_command(argv, timeout=SERVER_COMMAND_TIMEOUT, cancel=None):
+    """Run a whitelisted command on the server itself"""
+    try:
+        result = run_process(argv, timeout, cancel)
+        return {
+            'success': True,
+            'output': result.stdout,
+            'error': result.stderr if result.stderr else None
+        }
+    except subprocess.TimeoutExpired:
+        return {'success': False, 'timed_out': True, 'error': f'Command timed out after {timeout:g} seconds'}
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -258,7 +868,10 @@ def index():
 
 @app.route('/api/system')
 def api_system():
-    """API endpoint for system information"""
+    """API endpoint for system information (?refresh=1 re-reads hostname and interfaces)"""
+    if request.args.get('refresh') == '1':
+        get_hostname.invalidate()
+        get_interfaces.invalidate()
     return jsonify(get_system_info())
 
 @app.route('/api/network')
@@ -304,30 +917,11 @@ def api_client_execute(client_name):
             'error': 'No command specified'
         })
     
-    # Whitelist of safe commands for client containers
-    safe_commands = {
-        'whoami': 'whoami',
-        'pwd': 'pwd', 
-        'ls': 'ls -la',
-        'date': 'date',
-        'uptime': 'uptime',
-        'ip addr': 'ip addr show',
-        'ps': 'ps aux',
-        'df': 'df -h',
-        'free': 'free -h',
-        'cat /etc/os-release': 'cat /etc/os-release',
-        'hostname': 'hostname',
-        'id': 'id',
-        'env': 'env',
-        'which python3': 'which python3',
-        'python3 --version': 'python3 --version',
-        'ping -c 3 8.8.8.8': 'ping -c 3 8.8.8.8',
-        'netstat -tuln': 'netstat -tuln'
-    }
+    safe_commands = CLIENT_SAFE_COMMANDS
     
     if command in safe_commands:
         container_name = CLIENT_CONTAINERS[client_name]
-        result = execute_command_on_client(container_name, safe_commands[command])
+        result = execute_catalog_command({client_name: container_name}, command)[client_name]
         
         if result['success']:
             return jsonify({
@@ -337,7 +931,9 @@ def api_client_execute(client_name):
                 'command': command,
                 'stdout': result['stdout'],
                 'stderr': result['stderr'] if result['stderr'] else None,
-                'exit_code': result['exit_code']
+                'exit_code': result['exit_code'],
+                'cached': result.get('cached', False),
+                'cached_age': result.get('cached_age')
             })
         else:
             return jsonify({
@@ -352,9 +948,107 @@ def api_client_execute(client_name):
             'error': f'Command not allowed. Available commands: {", ".join(safe_commands.keys())}'
         })
 
+STREAM_MAX_BYTES = int(os.getenv('STREAM_MAX_BYTES', str(1024 * 1024)))  # output forwarded per stream
+STREAM_LINE_MAX = 16 * 1024  # a partial line longer than this is flushed as is
+
+@app.route('/api/clients/<client_name>/execute/stream')
+def api_client_execute_stream(client_name):
+    """Execute a command on a client container, streaming output lines as Server-Sent Events
+
+    Events: stdout/stderr (one line each), truncated (STREAM_MAX_BYTES was
+    reached and the command was abandoned), exit ({"exit_code": N}) and
+    failure ({"error": "..."}). Idempotent commands with fresh cached output
+    replay it without an exec; their exit event carries "cached": true and
+    "cached_age".
+    """
+    command = request.args.get('command', '').strip()
+    if client_name not in CLIENT_CONTAINERS:
+        error = f'Unknown client: {client_name}. Available clients: {", ".join(CLIENT_CONTAINERS.keys())}'
+    elif command not in CLIENT_SAFE_COMMANDS:
+        error = f'Command not allowed. Available commands: {", ".join(CLIENT_SAFE_COMMANDS.keys())}'
+    else:
+        error = None
+    
+    def generate():
+        if error:
+            yield sse_event('failure', {'error': error})
+            return
+        
+        ttl = COMMAND_CATALOG[command]['ttl'] if OUTPUT_CACHE_ENABLED else None
+        with container_status_lock:
+            info = container_status.get(client_name, {})
+            container_id = info.get('container_id') if info.get('running') else None
+        cached = output_cache.get(container_id, command) if ttl and container_id else None
+        if cached is not None:
+            sent = 0
+            for stream in ('stdout', 'stderr'):
+                for line in (cached.get(stream) or '').splitlines():
+                    sent += len(line.encode('utf-8')) + 1
+                    if sent > STREAM_MAX_BYTES:
+                        yield sse_event('truncated', {'max_bytes': STREAM_MAX_BYTES})
+                        return
+                    yield sse_event(stream, line)
+            yield sse_event('exit', {'exit_code': cached.get('exit_code', 0), 'cached': True,
+                                     'cached_age': cached['cached_age']})
+            return
+        
+        # Only a partial line per stream is ever buffered here, never the whole output -
+        # unless it is to be cached, which truncation bounds at about STREAM_MAX_BYTES
+        partial = {'stdout': bytearray(), 'stderr': bytearray()}
+        collected = {'stdout': bytearray(), 'stderr': bytearray()} if ttl and container_id else None
+        sent = 0
+        chunks = stream_command_on_client(CLIENT_CONTAINERS[client_name], CLIENT_SAFE_COMMANDS[command])
+        try:
+            for stream, data in chunks:
+                if stream == 'exit':
+                    for name, rest in partial.items():
+                        if rest:
+                            yield sse_event(name, rest.decode('utf-8', errors='replace'))
+                    if collected is not None and data == 0:
+                        output_cache.put(container_id, command, {
+                            'success': True,
+                            'exit_code': 0,
+                            'stdout': collected['stdout'].decode('utf-8', errors='replace'),
+                            'stderr': collected['stderr'].decode('utf-8', errors='replace')
+                        }, ttl)
+                    yield sse_event('exit', {'exit_code': data})
+                    return
+                
+                if collected is not None:
+                    collected[stream] += data
+                buffer = partial[stream]
+                buffer += data
+                *lines, tail = buffer.split(b'\n')
+                if len(tail) > STREAM_LINE_MAX:
+                    lines.append(tail)
+                    tail = b''
+                partial[stream] = bytearray(tail)
+                for line in lines:
+                    sent += len(line) + 1
+                    if sent > STREAM_MAX_BYTES:
+                        yield sse_event('truncated', {'max_bytes': STREAM_MAX_BYTES})
+                        return
+                    yield sse_event(stream, line.decode('utf-8', errors='replace'))
+        except TimeoutError:
+            yield sse_event('failure', {'error': f'Command timed out after {COMMAND_TIMEOUT:g} seconds'})
+        except FileNotFoundError:
+            yield sse_event('failure', {'error': 'Docker command not found'})
+        except Exception as e:
+            yield sse_event('failure', {'error': str(e)})
+        finally:
+            chunks.close()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/clients/execute-all', methods=['POST'])
 def api_clients_execute_all():
-    """Execute command on all client containers"""
+    """Execute command on all client containers
+
+    With "aggregate": true in the body, identical outputs are collapsed into
+    groups (one copy of the output plus the clients that produced it) and
+    "diff": true adds a diff of each outlier group against the common output.
+    """
     data = request.get_json()
     command = data.get('command', '').strip()
     
@@ -364,26 +1058,7 @@ def api_clients_execute_all():
             'error': 'No command specified'
         })
     
-    # Use the same safe commands whitelist
-    safe_commands = {
-        'whoami': 'whoami',
-        'pwd': 'pwd', 
-        'ls': 'ls -la',
-        'date': 'date',
-        'uptime': 'uptime',
-        'ip addr': 'ip addr show',
-        'ps': 'ps aux',
-        'df': 'df -h',
-        'free': 'free -h',
-        'cat /etc/os-release': 'cat /etc/os-release',
-        'hostname': 'hostname',
-        'id': 'id',
-        'env': 'env',
-        'which python3': 'which python3',
-        'python3 --version': 'python3 --version',
-        'ping -c 3 8.8.8.8': 'ping -c 3 8.8.8.8',
-        'netstat -tuln': 'netstat -tuln'
-    }
+    safe_commands = CLIENT_SAFE_COMMANDS
     
     if command not in safe_commands:
         return jsonify({
@@ -392,21 +1067,30 @@ def api_clients_execute_all():
         })
     
     results = {}
+    batch = execute_catalog_command(CLIENT_CONTAINERS, command)
     for client_name, container_name in CLIENT_CONTAINERS.items():
-        result = execute_command_on_client(container_name, safe_commands[command])
+        result = batch[client_name]
         results[client_name] = {
             'container': container_name,
             'success': result['success'],
-            'stdout': result['stdout'] if result['success'] else None,
-            'stderr': result['stderr'] if result['success'] else None,
-            'error': result['error'] if not result['success'] else None,
-            'exit_code': result.get('exit_code', None)
+            'stdout': result.get('stdout') if result['success'] else None,
+            'stderr': result.get('stderr') if result['success'] else None,
+            'error': result.get('error', result.get('stderr')) if not result['success'] else None,
+            'exit_code': result.get('exit_code', None),
+            'timed_out': result.get('timed_out', False),
+            'cached': result.get('cached', False)
         }
     
-    return jsonify({
+    response = {
         'command': command,
-        'results': results
-    })
+        'partial': any(r['timed_out'] for r in results.values())
+    }
+    if data.get('aggregate'):
+        response['groups'] = group_results(results, diff=bool(data.get('diff')))
+        response['unique_outputs'] = len(response['groups'])
+    else:
+        response['results'] = results
+    return jsonify(response)
 
 @app.route('/api/execute', methods=['POST'])
 def api_execute():
@@ -414,59 +1098,188 @@ def api_execute():
     data = request.get_json()
     command = data.get('command', '').strip()
     
-    # Whitelist of safe commands
-    safe_commands = {
-        'whoami': ['whoami'],
-        'pwd': ['pwd'],
-        'ls': ['ls', '-la'],
-        'date': ['date'],
-        'uptime': ['uptime'],
-        'ip addr': ['ip', 'addr', 'show'],
-        'ps': ['ps', 'aux'],
-        'df': ['df', '-h'],
-        'free': ['free', '-h']
-    }
+    safe_commands = SERVER_SAFE_COMMANDS
     
     if command in safe_commands:
-        try:
-            result = subprocess.run(
-                safe_commands[command],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            return jsonify({
-                'success': True,
-                'output': result.stdout,
-                'error': result.stderr if result.stderr else None
-            })
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            })
+        return jsonify(execute_server_command(safe_commands[command]))
     else:
         return jsonify({
             'success': False,
             'error': f'Command not allowed. Available commands: {", ".join(safe_commands.keys())}'
         })
 
+# ==== ASYNC JOB ENDPOINTS ====
+JOB_MAX_TIMEOUT = float(os.getenv('JOB_MAX_TIMEOUT', '300'))  # upper bound on a job's requested timeout
+jobs = JobManager(
+    max_concurrent=int(os.getenv('JOB_MAX_CONCURRENT', '4')),
+    max_pending=int(os.getenv('JOB_MAX_PENDING', '64')),
+    history=int(os.getenv('JOB_HISTORY', '200')),
+    # Shared job records let any worker answer for a job, whichever one runs it
+    store=state if STATE_BACKEND == 'sqlite' else None,
+    poll_interval=STATE_POLL_INTERVAL
+)
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """Submit a whitelisted command to run in the background and return its job id
+
+    target is 'server', 'all' (every client container) or a client name.
+    """
+    data = request.get_json() or {}
+    command = data.get('command', '').strip()
+    target = data.get('target', 'server')
+    
+    if target == 'server':
+        safe_commands = SERVER_SAFE_COMMANDS
+        default_timeout = SERVER_COMMAND_TIMEOUT
+    elif target == 'all' or target in CLIENT_CONTAINERS:
+        safe_commands = CLIENT_SAFE_COMMANDS
+        default_timeout = COMMAND_TIMEOUT
+    else:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown target: {target}. Use server, all or one of: {", ".join(CLIENT_CONTAINERS.keys())}'
+        }), 400
+    
+    if command not in safe_commands:
+        return jsonify({
+            'success': False,
+            'error': f'Command not allowed. Available commands: {", ".join(safe_commands.keys())}'
+        }), 400
+    
+    try:
+        timeout = float(data.get('timeout', default_timeout))
+    except (TypeError, ValueError):
+        timeout = math.nan
+    if not math.isfinite(timeout) or timeout <= 0:
+        return jsonify({'success': False, 'error': 'timeout must be a positive number of seconds'}), 400
+    timeout = min(timeout, JOB_MAX_TIMEOUT)
+    
+    if target == 'server':
+        run = lambda cancel, t: execute_server_command(safe_commands[command], t, cancel)
+    elif target == 'all':
+        def run(cancel, t):
+            results = execute_command_on_clients(CLIENT_CONTAINERS, safe_commands[command], t, cancel)
+            if cancel.is_set():
+                raise JobCancelled()
+            return {
+                'success': all(r['success'] for r in results.values()),
+                'timed_out': any(r.get('timed_out') for r in results.values()),
+                'results': results
+            }
+    else:
+        run = lambda cancel, t: execute_command_on_client(CLIENT_CONTAINERS[target], safe_commands[command], t, cancel)
+    
+    try:
+        job = jobs.submit({'command': command, 'target': target}, run, timeout)
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+
+@app.route('/api/jobs')
+def api_list_jobs():
+    """List recent jobs (without their output)"""
+    return jsonify({
+        'success': True,
+        'jobs': [dict(job.to_dict(), result=None) for job in reversed(jobs.recent())]
+    })
+
+@app.route('/api/jobs/<job_id>')
+def api_get_job(job_id):
+    """Get a job's status and, once finished, its result
+
+    With ?wait=<seconds> the request blocks until the job finishes or the wait expires.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f'Unknown job: {job_id}'}), 404
+    
+    try:
+        wait_seconds = parse_wait(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'wait must be a number of seconds'}), 400
+    if wait_seconds:
+        job = jobs.wait(job, wait_seconds)
+    
+    return jsonify(dict(job.to_dict(), success=True))
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def api_cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f'Unknown job: {job_id}'}), 404
+    
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+
 # ==== CLIENT CONNECTION MONITORING ENDPOINTS ====
 
 def add_connection_event(event_type, client_id, details=""):
     """Add a connection event to the monitoring log"""
-    with connections_lock:
-        event = {
-            'timestamp': datetime.now().isoformat(),
-            'type': event_type,  # 'connect', 'disconnect', 'heartbeat', 'command', 'register'
-            'client_id': client_id,
-            'details': details
-        }
-        connection_events.append(event)
-        
-        # Keep only last 100 events
-        if len(connection_events) > 100:
-            connection_events.pop(0)
+    event = {
+        'timestamp': datetime.now().isoformat(),
+        'type': event_type,  # 'connect', 'disconnect', 'heartbeat', 'command', 'broadcast', 'register'
+        'client_id': client_id,
+        'details': details
+    }
+    # The event log has its own lock and drops the oldest event once full
+    state.add_event(event)
+
+# ==== CLIENT LIVENESS ====
+CLIENT_TIMEOUT = float(os.getenv('CLIENT_TIMEOUT', '300'))  # seconds without contact before 'disconnected'
+SWEEP_INTERVAL = float(os.getenv('SWEEP_INTERVAL', '5'))  # seconds between staleness sweeps
+client_liveness = LivenessTracker(timeout=CLIENT_TIMEOUT)
+
+def mark_client_seen(update):
+    """Record contact from a registered client (a ClientUpdate from state.update())
+
+    Returns True if this brought a disconnected client back.
+    """
+    record = update.record
+    now = time.time()
+    reconnected = record.status != 'connected'
+    # Publish heartbeat-only updates once per LAST_SEEN_RESOLUTION so they don't count as churn
+    publish = reconnected or int(now // LAST_SEEN_RESOLUTION) != int(record.last_seen // LAST_SEEN_RESOLUTION)
+    record.last_seen = now
+    record.status = 'connected'
+    client_liveness.touch(record.client_id)
+    if publish:
+        update.publish()
+    return reconnected
+
+def sweep_stale_clients():
+    """Mark clients whose deadline passed as disconnected, logging one event per transition"""
+    for client_id in client_liveness.expire():
+        with state.update(client_id) as update:
+            record = update.record
+            # A touch can race the sweep; only a client still past its deadline goes stale
+            if record is None or record.status != 'connected' or client_id in client_liveness:
+                continue
+            idle = time.time() - record.last_seen
+            if idle < CLIENT_TIMEOUT - SWEEP_INTERVAL:
+                # Seen more recently than this process knew, through another worker: track it from
+                # then. A client within a sweep of its deadline is simply declared stale now.
+                client_liveness.touch(client_id, now=time.monotonic() - idle)
+                continue
+            record.status = 'disconnected'
+            update.publish()
+        add_connection_event('disconnect', client_id, "Connection timeout")
+
+def liveness_sweeper():
+    """Background thread: expire stale clients every SWEEP_INTERVAL seconds"""
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        try:
+            sweep_stale_clients()
+        except Exception as e:
+            print(f"Warning: staleness sweep failed: {e}")
+
+# Restored clients get a full timeout from startup to check back in
+for restored_record in state.clients():
+    if restored_record.status == 'connected':
+        client_liveness.touch(restored_record.client_id)
+threading.Thread(target=liveness_sweeper, name='liveness-sweeper', daemon=True).start()
 
 @app.route('/api/register', methods=['POST'])
 def api_register_client():
@@ -476,24 +1289,25 @@ def api_register_client():
         return jsonify({'success': False, 'error': 'Invalid registration data'})
     
     client_id = data['client_id']
+    tags = data.get('tags', [])
+    if not isinstance(tags, list):
+        return jsonify({'success': False, 'error': 'tags must be a list of strings'})
     
-    with connections_lock:
+    with state.update(client_id) as update:
         # Update client info
-        connected_clients[client_id] = {
-            'client_id': client_id,
-            'hostname': data.get('hostname', 'unknown'),
-            'os': data.get('os', 'unknown'),
-            'arch': data.get('arch', 'unknown'),
-            'user': data.get('user', 'unknown'),
-            'pwd': data.get('pwd', 'unknown'),
-            'local_ip': data.get('local_ip', request.remote_addr),
-            'remote_ip': request.remote_addr,
-            'first_seen': datetime.now().isoformat(),
-            'last_seen': datetime.now().isoformat(),
-            'status': 'connected',
-            'command_count': 0,
-            'result_count': 0
-        }
+        update.record = ClientRecord(
+            client_id=client_id,
+            hostname=data.get('hostname', 'unknown'),
+            os=data.get('os', 'unknown'),
+            arch=data.get('arch', 'unknown'),
+            user=data.get('user', 'unknown'),
+            pwd=data.get('pwd', 'unknown'),
+            local_ip=data.get('local_ip', request.remote_addr),
+            remote_ip=request.remote_addr,
+            tags=tuple(str(tag) for tag in tags)
+        )
+        update.publish()
+        client_liveness.touch(client_id)
     
     # Log the registration event
     add_connection_event('register', client_id, f"New client from {request.remote_addr}")
@@ -511,23 +1325,22 @@ def api_heartbeat():
     
     client_id = data['client_id']
     
-    with connections_lock:
-        if client_id in connected_clients:
-            connected_clients[client_id]['last_seen'] = datetime.now().isoformat()
-            connected_clients[client_id]['status'] = 'connected'
+    reconnected = False
+    with state.update(client_id) as update:
+        if update.record is not None:
+            reconnected = mark_client_seen(update)
         else:
             # Auto-register if not found
-            connected_clients[client_id] = {
-                'client_id': client_id,
-                'hostname': 'unknown',
-                'os': 'unknown',
-                'remote_ip': request.remote_addr,
-                'first_seen': datetime.now().isoformat(),
-                'last_seen': datetime.now().isoformat(),
-                'status': 'connected',
-                'command_count': 0,
-                'result_count': 0
-            }
+            update.record = ClientRecord(
+                client_id=client_id,
+                local_ip=request.remote_addr,
+                remote_ip=request.remote_addr
+            )
+            update.publish()
+            client_liveness.touch(client_id)
+    
+    if reconnected:
+        add_connection_event('connect', client_id, "Client reconnected")
     
     # Log heartbeat (but only occasionally to avoid spam)
     if int(time.time()) % 30 == 0:  # Log every 30th heartbeat
@@ -537,15 +1350,30 @@ def api_heartbeat():
 
 @app.route('/api/clients/<client_id>', methods=['GET'])
 def api_get_client_commands(client_id):
-    """Get pending commands for a specific client"""
-    with connections_lock:
-        commands = client_commands.get(client_id, [])
-        # Mark commands as delivered
-        client_commands[client_id] = []
+    """Get pending commands for a specific client
+
+    With ?wait=<seconds> this is a long-poll: if nothing is queued the request
+    blocks until a command is sent to the client or the wait expires.
+    """
+    try:
+        wait_seconds = parse_wait(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'wait must be a number of seconds'}), 400
+    
+    reconnected = False
+    with state.update(client_id) as update:
+        # Polling for work is proof of life for a registered agent
+        if update.record is not None:
+            reconnected = mark_client_seen(update)
+    if reconnected:
+        add_connection_event('connect', client_id, "Client reconnected")
+    # Taking commands off the queue marks them delivered
+    commands = state.take_commands(client_id, wait_seconds)
     
     return jsonify({
         'success': True,
-        'commands': commands
+        'commands': commands,
+        'long_poll': True
     })
 
 @app.route('/api/clients/<client_id>/command', methods=['POST'])
@@ -555,33 +1383,183 @@ def api_send_client_command(client_id):
     if not data or 'command' not in data:
         return jsonify({'success': False, 'error': 'No command provided'})
     
-    command_id = f"cmd-{int(time.time())}-{client_id}"
+    command_id = f"cmd-{int(time.time())}-{client_id}-{uuid.uuid4().hex[:8]}"
     command_data = {
         'id': command_id,
         'command': data['command'],
         'timestamp': datetime.now().isoformat()
     }
     
-    with connections_lock:
-        client_commands[client_id].append(command_data)
-        if client_id in connected_clients:
-            connected_clients[client_id]['command_count'] += 1
+    state.queue_command([client_id], command_data)
     
     add_connection_event('command', client_id, f"Sent: {data['command']}")
     
     return jsonify({'success': True, 'command_id': command_id})
 
-@app.route('/api/results', methods=['POST'])
-def api_receive_results():
-    """Receive command results from clients"""
-    data = request.get_json()
-    if not data or 'client_id' not in data:
-        return jsonify({'success': False, 'error': 'Invalid result data'})
+# ==== GROUP COMMANDS ====
+def select_clients(selector):
+    """Ids of registered agents matching a broadcast selector
+
+    Every given criterion must match: tag (registered with that tag), os and
+    arch (case-insensitive), hostname (shell-style pattern, e.g. "web-*").
+    Disconnected agents are skipped unless include_disconnected is set.
+    """
+    tag = selector.get('tag')
+    os_name = (selector.get('os') or '').lower()
+    arch = (selector.get('arch') or '').lower()
+    hostname = selector.get('hostname')
+    include_disconnected = selector.get('include_disconnected', False)
     
-    client_id = data['client_id']
-    command_id = data.get('command_id', 'unknown')
-    result = data.get('result', {})
+    return [
+        record.client_id for record in state.clients()
+        if (include_disconnected or record.status == 'connected')
+        and (not tag or tag in record.tags)
+        and (not os_name or record.os.lower() == os_name)
+        and (not arch or record.arch.lower() == arch)
+        and (not hostname or fnmatch.fnmatchcase(record.hostname, hostname))
+    ]
+
+@app.route('/api/broadcast', methods=['POST'])
+def api_broadcast_command():
+    """Send one command to every agent matching a selector
+
+    Body: {"command": "...", "all": true} or any of "tag", "os", "arch",
+    "hostname" (pattern) and "include_disconnected". The command is queued
+    once, by reference, on each target's queue; agents report results under
+    the returned broadcast_id, aggregated at GET /api/broadcasts/<id>.
+    """
+    data = request.get_json(silent=True)
+    if not data or not data.get('command'):
+        return jsonify({'success': False, 'error': 'No command provided'}), 400
+    selector = {key: data[key] for key in ('tag', 'os', 'arch', 'hostname', 'include_disconnected')
+                if data.get(key) not in (None, '')}
+    for key in ('tag', 'os', 'arch', 'hostname'):
+        if key in selector and not isinstance(selector[key], str):
+            return jsonify({'success': False, 'error': f'{key} must be a string'}), 400
+    if not data.get('all') and not (selector.keys() - {'include_disconnected'}):
+        return jsonify({'success': False,
+                        'error': 'Give a tag, os, arch or hostname selector, or "all": true'}), 400
+    
+    targets = select_clients(selector)
+    broadcast = Broadcast(data['command'], selector or {'all': True}, targets)
+    state.add_broadcast(broadcast)
+    command_data = {
+        'id': broadcast.id,
+        'command': data['command'],
+        'timestamp': datetime.now().isoformat(),
+        'broadcast_id': broadcast.id
+    }
+    
+    state.queue_command(targets, command_data)
+    
+    add_connection_event('broadcast', broadcast.id, f"Sent to {len(targets)} clients: {data['command']}")
+    
+    return jsonify({'success': True, 'broadcast_id': broadcast.id, 'targets': targets})
+
+@app.route('/api/broadcasts')
+def api_list_broadcasts():
+    """Recent broadcasts with result counts, newest first"""
+    return jsonify({'success': True,
+                    'broadcasts': state.broadcast_summaries()})
+
+@app.route('/api/broadcasts/<broadcast_id>')
+def api_broadcast_results(broadcast_id):
+    """A broadcast's results by client, plus the clients yet to report
+
+    ?aggregate=1 replaces the per-client results with groups of identical
+    output (see execute-all); ?diff=1 adds diffs for the outlier groups.
+    """
+    broadcast = state.broadcast(broadcast_id)
+    if broadcast is None:
+        return jsonify({'success': False, 'error': f'Unknown broadcast: {broadcast_id}'}), 404
+    
+    info = broadcast.to_dict()
+    if request.args.get('aggregate') == '1':
+        info['groups'] = group_results(info.pop('results'), diff=request.args.get('diff') == '1')
+        info['unique_outputs'] = len(info['groups'])
+    return jsonify({'success': True, 'broadcast': info})
+
+# ==== RESULT INGESTION ====
+RESULT_MAX_BODY = int(os.getenv('RESULT_MAX_BODY', str(32 * 1024 * 1024)))  # decoded bytes of one upload
+RESULT_INLINE_MAX = int(os.getenv('RESULT_INLINE_MAX', str(64 * 1024)))  # bytes of a result kept in memory
+RESULT_PREVIEW_BYTES = 1024  # head of a spilled output kept inline
+RESULT_BLOB_DIR = os.getenv('RESULT_BLOB_DIR', os.path.join(tempfile.gettempdir(), 'c2-result-blobs'))
+result_blobs = BlobStore(RESULT_BLOB_DIR, max_age=float(os.getenv('RESULTS_MAX_AGE', '86400')))
+
+class RequestRejected(Exception):
+    """An upload that can't be accepted; carries the HTTP status to answer with"""
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+def read_json_body(max_bytes):
+    """Parse the request body as JSON, inflating gzip or zstd Content-Encoding
+
+    Neither the raw nor the decoded body may exceed max_bytes, so a small
+    compressed upload can't expand into an unbounded one.
+    """
+    if (request.content_length or 0) > max_bytes:
+        raise RequestRejected(f'Request body exceeds {max_bytes} bytes', 413)
+    body = request.stream.read(max_bytes + 1)
+    encoding = request.headers.get('Content-Encoding', 'identity').lower()
+    try:
+        if encoding == 'gzip':
+            body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body, max_bytes + 1)
+        elif encoding == 'zstd':
+            if zstandard is None:
+                raise RequestRejected('zstd Content-Encoding is not supported by this server', 415)
+            body = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read(max_bytes + 1)
+        elif encoding != 'identity':
+            raise RequestRejected(f'Unsupported Content-Encoding: {encoding}', 415)
+    except (zlib.error, EOFError) as e:
+        raise RequestRejected(f'Could not decode {encoding} body: {e}', 400)
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise RequestRejected(f'Could not decode {encoding} body: {e}', 400)
+        raise
+    if len(body) > max_bytes:
+        raise RequestRejected(f'Request body exceeds {max_bytes} bytes', 413)
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise RequestRejected(f'Invalid JSON: {e}', 400)
+
+def cap_result(result):
+    """Bound a reported result to RESULT_INLINE_MAX bytes in memory
+
+    stdout/stderr over the cap move to the blob store, leaving a preview and
+    a reference; anything else over the cap is refused.
+    """
+    for field in ('stdout', 'stderr') if isinstance(result, dict) else ():
+        output = result.get(field)
+        if not isinstance(output, str) or len(output) <= RESULT_INLINE_MAX:
+            continue
+        data = output.encode('utf-8', errors='replace')
+        if len(data) <= RESULT_INLINE_MAX:
+            continue
+        blob_id = result_blobs.put(data)
+        result[field] = data[:RESULT_PREVIEW_BYTES].decode('utf-8', errors='ignore')
+        result[f'{field}_blob'] = {'id': blob_id, 'size': len(data), 'url': f'/api/blobs/{blob_id}'}
+    if len(json.dumps(result, default=str)) > RESULT_INLINE_MAX:
+        raise RequestRejected(f'Result exceeds {RESULT_INLINE_MAX} bytes outside stdout/stderr', 413)
+    return result
+
+@app.route('/api/blobs/<blob_id>')
+def api_get_blob(blob_id):
+    """Full text of a spilled command output"""
+    if not result_blobs.exists(blob_id):
+        return jsonify({'success': False, 'error': f'No such blob: {blob_id}'}), 404
     
+    headers = {'Cache-Control': 'private, max-age=86400, immutable', 'Vary': 'Accept-Encoding'}
+    with open(result_blobs.path(blob_id), 'rb') as f:
+        compressed = f.read()
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        # Blobs are stored gzip-compressed: hand the file over as-is
+        return Response(compressed, mimetype='text/plain', headers={**headers, 'Content-Encoding': 'gzip'})
+    return Response(gzip.decompress(compressed), mimetype='text/plain', headers=headers)
+
+def record_result(client_id, command_id, result):
+    """Store one (already capped) command result reported by a client"""
     result_data = {
         'command_id': command_id,
         'timestamp': datetime.now().isoformat(),
@@ -589,63 +1567,334 @@ def api_receive_results():
         'client_id': client_id
     }
     
-    with connections_lock:
-        client_results[client_id].append(result_data)
-        if client_id in connected_clients:
-            connected_clients[client_id]['result_count'] += 1
-            connected_clients[client_id]['last_seen'] = datetime.now().isoformat()
+    state.add_result(result_data)
+    if command_id.startswith('bcast-'):
+        state.record_broadcast_result(command_id, client_id, result)
+
+@app.route('/api/results', methods=['POST'])
+def api_receive_results():
+    """Receive command results from clients
+
+    The body may be gzip or zstd compressed (Content-Encoding). stdout and
+    stderr longer than RESULT_INLINE_MAX are kept on disk: the stored result
+    holds a preview plus stdout_blob/stderr_blob references to /api/blobs/<id>.
+    """
+    try:
+        data = read_json_body(RESULT_MAX_BODY)
+        if not isinstance(data, dict) or 'client_id' not in data:
+            return jsonify({'success': False, 'error': 'Invalid result data'})
+        result = cap_result(data.get('result', {}))
+    except RequestRejected as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
     
+    client_id = data['client_id']
+    record_result(client_id, str(data.get('command_id', 'unknown')), result)
+    reconnected = False
+    with state.update(client_id) as update:
+        if update.record is not None:
+            update.record.result_count += 1
+            reconnected = mark_client_seen(update)
+            update.publish()
+    
+    if reconnected:
+        add_connection_event('connect', client_id, "Client reconnected")
     add_connection_event('result', client_id, f"Command result received")
     
     return jsonify({'success': True})
 
+@app.route('/api/checkin', methods=['POST'])
+def api_checkin():
+    """Heartbeat, result upload and command fetch in one round trip
+
+    Body: {"client_id": ..., "results": [{"command_id": ..., "result": {...}}, ...],
+    "wait": <seconds>}, optionally gzip or zstd compressed like /api/results.
+    The results are stored first, then the request long-polls for up to wait
+    seconds (0: return at once) and answers with the newly queued commands.
+    An oversized result is stored as an error rather than failing the batch.
+    """
+    try:
+        data = read_json_body(RESULT_MAX_BODY)
+    except RequestRejected as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    if not isinstance(data, dict) or 'client_id' not in data or not isinstance(data.get('results', []), list):
+        return jsonify({'success': False, 'error': 'Invalid check-in data'}), 400
+    
+    client_id = data['client_id']
+    try:
+        wait_seconds = parse_wait(data.get('wait', 0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'wait must be a number of seconds'}), 400
+    
+    results = [entry for entry in data.get('results', []) if isinstance(entry, dict)]
+    for entry in results:
+        try:
+            result = cap_result(entry.get('result', {}))
+        except RequestRejected as e:
+            result = {'success': False, 'error': f'Result rejected by server: {e}'}
+        record_result(client_id, str(entry.get('command_id', 'unknown')), result)
+    
+    reconnected = False
+    with state.update(client_id) as update:
+        if update.record is not None:
+            update.record.result_count += len(results)
+            reconnected = mark_client_seen(update)
+            if results:
+                update.publish()
+        else:
+            # Auto-register if not found, as a heartbeat does
+            update.record = ClientRecord(
+                client_id=client_id,
+                local_ip=request.remote_addr,
+                remote_ip=request.remote_addr,
+                result_count=len(results)
+            )
+            update.publish()
+            client_liveness.touch(client_id)
+    
+    # Log before the long-poll so the dashboard sees results as they arrive
+    if reconnected:
+        add_connection_event('connect', client_id, "Client reconnected")
+    if results:
+        add_connection_event('result', client_id, f"{len(results)} command result(s) received")
+    
+    commands = state.take_commands(client_id, wait_seconds)
+    
+    return jsonify({
+        'success': True,
+        'accepted': len(results),
+        'commands': commands,
+        'long_poll': True
+    })
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header names etag (or is *), comparing weakly as RFC 9110 asks"""
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in tags)
+
 @app.route('/api/connections')
 def api_connections():
-    """Get current client connections and events"""
-    with connections_lock:
-        # Clean up stale connections (no heartbeat in 5 minutes)
-        current_time = datetime.now()
-        stale_clients = []
-        
-        for client_id, info in connected_clients.items():
-            last_seen = datetime.fromisoformat(info['last_seen'])
-            if (current_time - last_seen).seconds > 300:  # 5 minutes
-                info['status'] = 'disconnected'
-                stale_clients.append(client_id)
-        
-        # Log disconnections
-        for client_id in stale_clients:
-            add_connection_event('disconnect', client_id, "Connection timeout")
-        
-        return jsonify({
-            'success': True,
-            'clients': dict(connected_clients),
-            'events': connection_events[-20:],  # Last 20 events
-            'total_clients': len(connected_clients),
-            'active_clients': len([c for c in connected_clients.values() if c['status'] == 'connected']),
-            'total_events': len(connection_events)
-        })
+    """Get current client connections and events
+
+    ?since=<version> returns only clients changed after that connection table
+    version (pass back version from the previous response) and
+    ?events_since=<seq> only events newer than that sequence number (pass back
+    event_seq). Without them the full table and the last 20 events are sent.
+    An If-None-Match matching the current ETag gets a 304.
+    """
+    # Read the version first: anything changing while we build the response is
+    # either included now or returned again next time, never missed
+    version = state.version
+    etag = f'W/"{state.epoch}-{version}-{state.last_event_seq}"'
+    if etag_matches(request.headers.get('If-None-Match', ''), etag):
+        return Response(status=304, headers={'ETag': etag})
+    
+    response = jsonify(connections_payload(version, request.args.get('since', type=int),
+                                           request.args.get('events_since', type=int)))
+    response.headers['ETag'] = etag
+    return response
+
+def connections_payload(version, since=None, events_since=None):
+    """Connection table (or the delta after `since`) and events after `events_since`, as of `version`"""
+    full = since is None or since > version  # first load, or a version from before a restart
+    # Staleness is handled by the background liveness sweeper; just read the table
+    clients = state.snapshot(None if full else state.changed_since(since))
+    
+    last_event_seq = state.last_event_seq
+    if events_since is None or events_since > last_event_seq:
+        # First load, or the dashboard is ahead of us (server restarted)
+        events, events_truncated = state.events_tail(20), events_since is not None
+    else:
+        events, events_truncated = state.events_since(events_since)
+    
+    return {
+        'success': True,
+        'full': full,  # clients is the whole table rather than a delta
+        'version': version,
+        'clients': clients,
+        'events': events,
+        'events_truncated': events_truncated,  # events after ?events_since= were dropped, refetch the tail
+        'event_seq': events[-1]['seq'] if events else (events_since or 0),
+        'total_clients': state.client_count(),
+        'active_clients': state.active_count(),
+        'total_events': last_event_seq
+    }
 
 @app.route('/api/client/<client_id>/results')
 def api_client_results(client_id):
-    """Get results for a specific client"""
-    with connections_lock:
-        results = client_results.get(client_id, [])
+    """Get results for a specific client, newest page first
+
+    ?limit=N sets the page size (default 10) and ?cursor=<next_cursor> from a
+    previous response fetches the next page of older results.
+    """
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    cursor = request.args.get('cursor', type=int)
+    results, next_cursor = state.results_page(client_id, cursor=cursor, limit=limit)
     
     return jsonify({
         'success': True,
         'client_id': client_id,
-        'results': results[-10:]  # Last 10 results
+        'results': results,
+        'next_cursor': next_cursor
     })
 
+@app.route('/api/results/<command_id>')
+def api_command_result(command_id):
+    """Get the result of a single command"""
+    result = state.result(command_id)
+    if result is None:
+        return jsonify({'success': False, 'error': f'No result for command: {command_id}'}), 404
+    
+    return jsonify({'success': True, 'result': result})
+
+# ==== METRICS ====
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Label by route pattern, not path, so per-client URLs share a series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(time.perf_counter() - started, route=route, method=request.method,
+                                status=response.status_code)
+    return response
+
+def command_queue_stats():
+    depths = state.queue_depths()
+    return {('total',): sum(depths), ('max',): max(depths, default=0),
+            ('nonempty_queues',): sum(1 for depth in depths if depth)}
+
+metrics.gauge('c2_command_queue', 'Commands waiting for agents to fetch them', command_queue_stats, ('stat',))
+metrics.gauge('c2_result_store', 'Command results held in the state backend',
+              lambda: {(key,): value for key, value in state.result_stats().items()}, ('stat',))
+metrics.gauge('c2_clients_registered', 'Registered agents', state.client_count)
+metrics.gauge('c2_clients_active', 'Agents currently connected', state.active_count)
+metrics.gauge('c2_connection_events', 'Connection events logged', lambda: state.last_event_seq)
+metrics.gauge('c2_jobs_pending', 'Queued or running async jobs',
+              lambda: sum(1 for job in jobs.recent() if not job.done))
+metrics.gauge('c2_feed_subscribers', 'Open dashboard feeds', lambda: len(dashboard_feed))
+metrics.gauge('c2_state_db_write_queue', 'State changes waiting for the database writer',
+              lambda: state_db.pending() if state_db else None)
+metrics.gauge('c2_output_cache_entries', 'Cached idempotent command outputs', lambda: len(output_cache))
+metrics.gauge('c2_threads', 'Live threads in the server process', threading.active_count)
+
+@app.route('/metrics')
+def api_metrics():
+    """Server metrics in the Prometheus text exposition format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Opt-in sampling profiler: sys._current_frames() every PROFILER_INTERVAL while started
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '0') == '1'
+profiler = SamplingProfiler(interval=float(os.getenv('PROFILER_INTERVAL', '0.01')),
+                            max_duration=float(os.getenv('PROFILER_MAX_SECONDS', '300')))
+
+@app.route('/api/debug/profiler', methods=['GET', 'POST'])
+def api_profiler():
+    """Control the sampling profiler
+
+    POST {"action": "start" | "stop"} starts or stops sampling; GET returns
+    the samples as collapsed stacks (flame graph input), or the profiler's
+    status with ?status=1. Only available with PROFILER_ENABLED=1.
+    """
+    if not PROFILER_ENABLED:
+        return jsonify({'success': False, 'error': 'Profiler disabled; set PROFILER_ENABLED=1'}), 404
+    
+    if request.method == 'GET':
+        if request.args.get('status') == '1':
+            return jsonify({'success': True, **profiler.status()})
+        return Response(profiler.collapsed(), mimetype='text/plain')
+    
+    action = (request.get_json(silent=True) or {}).get('action')
+    if action == 'start':
+        profiler.start()
+    elif action == 'stop':
+        profiler.stop()
+    else:
+        return jsonify({'success': False, 'error': 'action must be "start" or "stop"'}), 400
+    return jsonify({'success': True, **profiler.status()})
+
+# ==== DASHBOARD FEED ====
+FEED_INTERVAL = float(os.getenv('FEED_INTERVAL', '1'))  # seconds between publisher checks for changes
+FEED_SYSTEM_INTERVAL = float(os.getenv('FEED_SYSTEM_INTERVAL', '30'))  # seconds between system info updates
+FEED_KEEPALIVE = 15  # seconds between SSE comments on an idle feed, to keep proxies from closing it
+FEED_MAX_BACKLOG = int(os.getenv('FEED_MAX_BACKLOG', '100'))  # frames a slow dashboard may lag before it is dropped
+
+dashboard_feed = Broadcaster(max_backlog=FEED_MAX_BACKLOG)
+
+def dashboard_publisher():
+    """Background thread: publish dashboard updates once for all feed subscribers
+
+    System info is gathered every FEED_SYSTEM_INTERVAL; network, container and
+    connection state are read from their caches every FEED_INTERVAL and only
+    sent when they change. Connection updates are deltas since the last one.
+    """
+    version, event_seq = state.version, state.last_event_seq
+    next_system = 0
+    while True:
+        time.sleep(FEED_INTERVAL)
+        if not len(dashboard_feed):
+            # Nobody is watching: do no work, and start the deltas from now once someone is
+            version, event_seq = state.version, state.last_event_seq
+            next_system = 0
+            continue
+        try:
+            if time.monotonic() >= next_system:
+                dashboard_feed.publish('system', get_system_info())
+                next_system = time.monotonic() + FEED_SYSTEM_INTERVAL
+            dashboard_feed.publish('network', ping_endpoints())
+            dashboard_feed.publish('clients', get_client_status())
+            current = state.version
+            if current != version or state.last_event_seq != event_seq:
+                payload = connections_payload(current, version, event_seq)
+                dashboard_feed.publish('connections', payload)
+                version, event_seq = current, payload['event_seq']
+        except Exception as e:
+            print(f"Warning: dashboard feed update failed: {e}")
+
+threading.Thread(target=dashboard_publisher, name='dashboard-publisher', daemon=True).start()
+
+@app.route('/api/feed')
+def api_feed():
+    """Live dashboard updates as Server-Sent Events
+
+    Starts with a snapshot of every panel, then streams system, network,
+    clients and connections events as they change. Connections events after
+    the snapshot are deltas (see /api/connections). A dashboard that falls
+    too far behind is disconnected and gets a fresh snapshot on reconnect.
+    """
+    def generate():
+        # Subscribe before taking the snapshot so no update can fall between the two
+        subscription = dashboard_feed.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            yield sse_event('system', get_system_info())
+            yield sse_event('network', ping_endpoints())
+            yield sse_event('clients', get_client_status())
+            yield sse_event('connections', connections_payload(state.version))
+            while True:
+                frames = subscription.get(timeout=FEED_KEEPALIVE)
+                if frames is None:
+                    return
+                yield ''.join(frames) if frames else ': keepalive\n\n'
+        finally:
+            dashboard_feed.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static/css', exist_ok=True)
     os.makedirs('static/js', exist_ok=True)
     
-    print("[*] Starting Malformed Labs C2 Server")
+    print("[*] Starting Malformed Labs C2 Server (development server)")
     print("[*] Connection monitoring enabled")
     print("[*] Access dashboard at http://0.0.0.0:8080")
+    print("[*] For production run: gunicorn -c gunicorn.conf.py app:app")
     
-    app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
+    # The reloader would import the app twice and start every background thread twice,
+    # so debug mode is opt-in
+    app.run(host='0.0.0.0', port=8080, debug=os.getenv('FLASK_DEBUG') == '1', threaded=True)
\ No newline at end of file
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Synthetic agent swarm for load testing the C2 server (no Docker needed)
+
+Simulates N agents speaking the same protocol as the embedded
+AutoC2Client - register, then one /api/checkin per round trip carrying
+the previous results (--protocol legacy: separate heartbeat, (long-)poll
+and per-result requests) - plus an operator sending commands and
+dashboards refreshing /api/connections, all as asyncio tasks over
+keep-alive HTTP/1.1 connections (standard library only). Reports
+throughput and p50/p90/p99 latency per endpoint, command delivery
+latency and server RSS, and compares them against a stored baseline.
+
+    gunicorn -c gunicorn.conf.py app:app &
+    python3 benchmarks/agent_swarm.py --agents 2000 --duration 60 \\
+        --server-pid $(pgrep -of 'gunicorn.*app:app') --baseline benchmarks/baseline.json
+
+Exits 1 when a metric regressed beyond --tolerance of the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+# Endpoints whose latency is mostly the server deliberately waiting, so it is not compared
+WAIT_BOUND = {'longpoll', 'longpoll-checkin'}
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client connection on asyncio streams"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, body=None, timeout=30):
+        reused = self._writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, body), timeout)
+        except (ConnectionError, asyncio.IncompleteReadError, IndexError) if reused else ():
+            # The server closed the idle keep-alive connection: retry once on a fresh one
+            self.close()
+            return await self.request(method, path, body, timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _request(self, method, path, body):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: keep-alive\r\n"
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+        self._writer.write(head.encode() + b"\r\n" + payload)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = bytearray()
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if not size:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self._reader.readexactly(int(headers.get('content-length', '0')))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, bytes(data)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+class Stats:
+    """Latency samples and error counts per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # endpoint -> seconds
+        self.errors = defaultdict(int)
+
+    async def timed(self, endpoint, conn, method, path, body=None, timeout=30):
+        """Issue a request, recording its latency; returns the parsed JSON body or None on failure"""
+        start = time.perf_counter()
+        try:
+            status, data = await conn.request(method, path, body, timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if status >= 400:
+            self.errors[endpoint] += 1
+            return None
+        try:
+            return json.loads(data) if data else {}
+        except ValueError:
+            return {}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, max(0, int(round(pct / 100 * len(samples))) - 1))]
+
+
+def process_rss(pid):
+    """Resident set size in bytes of a process and all its descendants (e.g. gunicorn's workers)"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class Swarm:
+    def __init__(self, args):
+        self.args = args
+        url = urlsplit(args.url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.run_id = uuid.uuid4().hex[:6]
+        self.stats = Stats()
+        self.registered = []  # client_ids that completed registration
+        self.sent_at = {}  # command_id -> perf_counter() when the operator queued it
+        self.received_at = {}  # command_id -> perf_counter() when an agent got it
+        self.duplicates = 0  # commands handed to an agent more than once
+        self.rss = []
+        self.stop = asyncio.Event()
+
+    def conn(self):
+        return HTTPConnection(self.host, self.port)
+
+    async def agent(self, index):
+        args = self.args
+        client_id = f"bench-{self.run_id}-{index:05d}"
+        conn = self.conn()
+        await asyncio.sleep(args.ramp * index / args.agents)
+        registration = {
+            'client_id': client_id,
+            'hostname': f"bench-host-{index:05d}",
+            'os': 'Linux',
+            'arch': 'x86_64',
+            'user': 'bench',
+            'pwd': '/',
+            'local_ip': f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+            'tags': ['bench', f"group-{index % 10}"]
+        }
+        while not self.stop.is_set():
+            if await self.stats.timed('register', conn, 'POST', '/api/register', registration) is not None:
+                break
+            await asyncio.sleep(1)
+        else:
+            return
+        self.registered.append(client_id)
+        if args.protocol == 'checkin':
+            await self.checkin_agent(client_id, conn)
+            return
+
+        heartbeat = asyncio.ensure_future(self.heartbeat(client_id))
+        try:
+            while not self.stop.is_set():
+                if args.delivery == 'longpoll':
+                    data = await self.stats.timed('longpoll', conn, 'GET',
+                                                  f'/api/clients/{client_id}?wait={args.longpoll_wait:g}',
+                                                  timeout=args.longpoll_wait + 10)
+                else:
+                    data = await self.stats.timed('poll', conn, 'GET', f'/api/clients/{client_id}')
+                if data is None:
+                    await asyncio.sleep(args.poll_interval)
+                    continue
+                now = time.perf_counter()
+                for command in data.get('commands', ()):
+                    # A long-poll can hand a command over before the operator's POST has returned,
+                    # so deliveries are matched to send times only when reporting
+                    self.delivered(command['id'], now)
+                    await self.stats.timed('results', conn, 'POST', '/api/results', {
+                        'client_id': client_id,
+                        'command_id': command['id'],
+                        'result': {'success': True, 'stdout': 'x' * args.output_bytes,
+                                   'stderr': '', 'exit_code': 0}
+                    })
+                if args.delivery == 'poll':
+                    await asyncio.sleep(args.poll_interval)
+        finally:
+            heartbeat.cancel()
+            conn.close()
+
+    def delivered(self, command_id, now):
+        if command_id in self.received_at:
+            self.duplicates += 1
+        else:
+            self.received_at[command_id] = now
+
+    async def checkin_agent(self, client_id, conn):
+        """Check in until stopped, each request carrying the results of the previous one's commands"""
+        args = self.args
+        wait = args.longpoll_wait if args.delivery == 'longpoll' else 0
+        endpoint = 'longpoll-checkin' if wait else 'checkin'
+        results = []
+        try:
+            while not self.stop.is_set():
+                data = await self.stats.timed(endpoint, conn, 'POST', '/api/checkin',
+                                              {'client_id': client_id, 'results': results, 'wait': wait},
+                                              timeout=wait + 10)
+                if data is None:
+                    await asyncio.sleep(args.poll_interval)
+                    continue
+                now = time.perf_counter()
+                results = []
+                for command in data.get('commands', ()):
+                    self.delivered(command['id'], now)
+                    results.append({'command_id': command['id'],
+                                    'result': {'success': True, 'stdout': 'x' * args.output_bytes,
+                                               'stderr': '', 'exit_code': 0}})
+                if args.delivery == 'poll' and not results:
+                    await asyncio.sleep(args.poll_interval)
+        finally:
+            conn.close()
+
+    async def heartbeat(self, client_id):
+        conn = self.conn()
+        try:
+            # Spread heartbeats over the interval rather than sending them in lockstep
+            await asyncio.sleep(random.uniform(0, self.args.heartbeat_interval))
+            while True:
+                await self.stats.timed('heartbeat', conn, 'POST', '/api/heartbeat', {'client_id': client_id})
+                await asyncio.sleep(self.args.heartbeat_interval)
+        finally:
+            conn.close()
+
+    async def operator(self):
+        """Queue commands to random agents at --command-rate per second"""
+        conn = self.conn()
+        interval = 1 / self.args.command_rate
+        try:
+            while not self.stop.is_set():
+                await asyncio.sleep(interval)
+                if not self.registered:
+                    continue
+                client_id = random.choice(self.registered)
+                sent = time.perf_counter()
+                data = await self.stats.timed('command', conn, 'POST', f'/api/clients/{client_id}/command',
+                                              {'command': 'echo bench'})
+                if data and data.get('command_id'):
+                    self.sent_at[data['command_id']] = sent
+        finally:
+            conn.close()
+
+    async def dashboard(self):
+        """Refresh the connection monitor every 5s, the way the polling dashboard does"""
+        conn = self.conn()
+        version = event_seq = None
+        try:
+            while not self.stop.is_set():
+                query = '' if version is None else f'?since={version}&events_since={event_seq}'
+                data = await self.stats.timed('connections', conn, 'GET', f'/api/connections{query}')
+                if data:
+                    version, event_seq = data.get('version'), data.get('event_seq')
+                await asyncio.sleep(5)
+        finally:
+            conn.close()
+
+    async def sample_rss(self):
+        while not self.stop.is_set():
+            rss = process_rss(self.args.server_pid)
+            if rss:
+                self.rss.append(rss)
+            await asyncio.sleep(1)
+
+    async def run(self):
+        args = self.args
+        tasks = [asyncio.ensure_future(self.agent(i)) for i in range(args.agents)]
+        tasks += [asyncio.ensure_future(self.dashboard()) for _ in range(args.dashboards)]
+        if args.command_rate > 0:
+            tasks.append(asyncio.ensure_future(self.operator()))
+        if args.server_pid:
+            tasks.append(asyncio.ensure_future(self.sample_rss()))
+
+        started = time.perf_counter()
+        await asyncio.sleep(args.ramp + args.duration)
+        self.stop.set()
+        # Open long-polls would only end with their wait: cancel instead of draining them
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        args = self.args
+        endpoints = {}
+        for endpoint, samples in sorted(self.stats.latencies.items()):
+            samples.sort()
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': self.stats.errors.get(endpoint, 0),
+                'throughput': len(samples) / elapsed,
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p90_ms': percentile(samples, 90) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+                'max_ms': samples[-1] * 1000
+            }
+        for endpoint, errors in self.stats.errors.items():
+            endpoints.setdefault(endpoint, {'requests': 0, 'errors': errors, 'throughput': 0})
+        delivery = sorted(self.received_at[command_id] - sent
+                          for command_id, sent in self.sent_at.items() if command_id in self.received_at)
+        return {
+            'parameters': {
+                'agents': args.agents,
+                'duration': args.duration,
+                'ramp': args.ramp,
+                'protocol': args.protocol,
+                'delivery': args.delivery,
+                'longpoll_wait': args.longpoll_wait,
+                'heartbeat_interval': args.heartbeat_interval,
+                'command_rate': args.command_rate,
+                'dashboards': args.dashboards,
+                'output_bytes': args.output_bytes
+            },
+            'registered': len(self.registered),
+            'elapsed': elapsed,
+            'total_throughput': sum(e['throughput'] for e in endpoints.values()),
+            'endpoints': endpoints,
+            'delivery': {
+                'commands': len(delivery),
+                'duplicates': self.duplicates,
+                'p50_ms': (percentile(delivery, 50) or 0) * 1000,
+                'p99_ms': (percentile(delivery, 99) or 0) * 1000
+            },
+            'rss': {'start_mb': self.rss[0] / 2**20, 'peak_mb': max(self.rss) / 2**20,
+                    'end_mb': self.rss[-1] / 2**20} if self.rss else None
+        }
+
+
+def print_report(report):
+    print(f"\nAgents registered: {report['registered']}  elapsed: {report['elapsed']:.1f}s  "
+          f"throughput: {report['total_throughput']:.1f} req/s")
+    print(f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>9}")
+    for endpoint, e in report['endpoints'].items():
+        if not e['requests']:
+            print(f"{endpoint:<16} {0:>9} {e['errors']:>7}")
+            continue
+        print(f"{endpoint:<16} {e['requests']:>9} {e['errors']:>7} {e['throughput']:>8.1f} {e['p50_ms']:>8.1f} "
+              f"{e['p90_ms']:>8.1f} {e['p99_ms']:>8.1f} {e['max_ms']:>9.1f}")
+    delivery = report['delivery']
+    print(f"command delivery: {delivery['commands']} commands, p50 {delivery['p50_ms']:.1f} ms, "
+          f"p99 {delivery['p99_ms']:.1f} ms, {delivery.get('duplicates', 0)} delivered twice")
+    if report['rss']:
+        rss = report['rss']
+        print(f"server RSS: start {rss['start_mb']:.1f} MB, peak {rss['peak_mb']:.1f} MB, end {rss['end_mb']:.1f} MB")
+
+
+def compare(report, baseline, tolerance):
+    """Regressions of report against baseline, as human-readable strings"""
+    problems = []
+    if baseline.get('parameters') != report['parameters']:
+        print(f"Warning: baseline was recorded with different parameters: {baseline.get('parameters')}")
+
+    def check(name, value, reference, higher_is_worse=True):
+        if value is None or not reference:
+            return
+        change = (value - reference) / reference
+        if (change if higher_is_worse else -change) > tolerance:
+            problems.append(f"{name}: {value:.1f} vs baseline {reference:.1f} ({change:+.0%})")
+
+    for endpoint, e in report['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(endpoint)
+        if base is None:
+            continue
+        check(f"{endpoint} throughput", e['throughput'], base.get('throughput'), higher_is_worse=False)
+        if e.get('errors', 0) > base.get('errors', 0) * (1 + tolerance):
+            problems.append(f"{endpoint} errors: {e['errors']} vs baseline {base.get('errors', 0)}")
+        if endpoint not in WAIT_BOUND and e['requests']:
+            check(f"{endpoint} p99 ms", e['p99_ms'], base.get('p99_ms'))
+    check('delivery p99 ms', report['delivery']['p99_ms'], baseline.get('delivery', {}).get('p99_ms'))
+    if report['delivery'].get('duplicates'):
+        problems.append(f"{report['delivery']['duplicates']} commands were delivered more than once")
+    if report['rss'] and baseline.get('rss'):
+        check('peak RSS MB', report['rss']['peak_mb'], baseline['rss'].get('peak_mb'))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='server base URL')
+    parser.add_argument('--agents', type=int, default=1000, help='simulated agents')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run after ramp-up')
+    parser.add_argument('--ramp', type=float, default=10, help='seconds over which agents register')
+    parser.add_argument('--delivery', choices=('longpoll', 'poll'), default='longpoll',
+                        help='command delivery mode, as C2_DELIVERY on real agents')
+    parser.add_argument('--protocol', choices=('checkin', 'legacy'), default='checkin',
+                        help='agent protocol: combined /api/checkin, or separate heartbeat/poll/results requests')
+    parser.add_argument('--longpoll-wait', type=float, default=25, help='?wait= seconds per long-poll')
+    parser.add_argument('--poll-interval', type=float, default=5, help='seconds between polls (poll mode)')
+    parser.add_argument('--heartbeat-interval', type=float, default=30, help='seconds between heartbeats')
+    parser.add_argument('--command-rate', type=float, default=20, help='operator commands per second (0: none)')
+    parser.add_argument('--dashboards', type=int, default=2, help='dashboards polling /api/connections')
+    parser.add_argument('--output-bytes', type=int, default=256, help='stdout bytes per simulated result')
+    parser.add_argument('--server-pid', type=int, help='server process (with children) to sample RSS from')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--baseline', help='baseline report to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to --baseline instead')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    # Every legacy agent holds two sockets (poll + heartbeat)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.agents * 2 + 64
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+        if hard < wanted:
+            print(f"Warning: open file limit {hard} is too low for {args.agents} agents")
+
+    swarm = Swarm(args)
+    print(f"Running {args.agents} agents against {args.url} for {args.ramp:g}s ramp + {args.duration:g}s...")
+    report = swarm.report(asyncio.run(swarm.run()))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        if problems:
+            print("\nRegressions against baseline:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
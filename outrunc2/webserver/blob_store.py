@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""On-disk store for command outputs too large to keep inline"""
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+BLOB_ID = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BlobStore:
+    """Content-addressed, gzip-compressed blobs in a directory
+
+    A blob's id is the SHA-256 of its contents, so the same large output
+    reported by many clients is stored once. Blobs not written or re-written
+    for max_age seconds are deleted by an at most hourly sweep on put().
+    """
+
+    def __init__(self, directory, max_age=86400):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+        self._last_prune = 0
+        self._lock = threading.Lock()
+
+    def put(self, data):
+        """Store bytes and return their blob id"""
+        blob_id = hashlib.sha256(data).hexdigest()
+        path = self.path(blob_id)
+        if os.path.exists(path):
+            os.utime(path)  # keep a re-reported output alive
+        else:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=6))
+            os.replace(tmp, path)
+        self._maybe_prune()
+        return blob_id
+
+    def path(self, blob_id):
+        """File holding a blob's gzip-compressed contents (None for a malformed id)"""
+        if not BLOB_ID.match(blob_id):
+            return None
+        return os.path.join(self.directory, f'{blob_id}.gz')
+
+    def exists(self, blob_id):
+        path = self.path(blob_id)
+        return path is not None and os.path.exists(path)
+
+    def _maybe_prune(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < 3600:
+                return
+            self._last_prune = now
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < now - self.max_age:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Commands sent to a group of agents at once, with their results gathered per broadcast"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class Broadcast:
+    """One command queued for a set of agents, and the results they have reported"""
+
+    def __init__(self, command, selector, targets):
+        self.id = f"bcast-{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        self.command = command
+        self.selector = selector
+        self.targets = frozenset(targets)
+        self.created = time.time()
+        self.results = {}  # client_id -> latest result reported for this broadcast
+
+    def to_record(self):
+        """Everything but the results, for a shared state backend to store"""
+        return {
+            'broadcast_id': self.id,
+            'command': self.command,
+            'selector': self.selector,
+            'targets': sorted(self.targets),
+            'created': self.created
+        }
+
+    @classmethod
+    def from_record(cls, record, results=None):
+        """Rebuild a broadcast from to_record() output plus its targets' results"""
+        broadcast = cls.__new__(cls)
+        broadcast.id = record['broadcast_id']
+        broadcast.command = record['command']
+        broadcast.selector = record['selector']
+        broadcast.targets = frozenset(record['targets'])
+        broadcast.created = record['created']
+        broadcast.results = {client_id: result for client_id, result in (results or {}).items()
+                             if client_id in broadcast.targets}
+        return broadcast
+
+    def summary(self):
+        # Agents may report any JSON as a result; only an object can claim success
+        succeeded = sum(1 for result in self.results.values()
+                        if isinstance(result, dict) and result.get('success'))
+        return {
+            'broadcast_id': self.id,
+            'command': self.command,
+            'selector': self.selector,
+            'created': self.created,
+            'targeted': len(self.targets),
+            'responded': len(self.results),
+            'pending': len(self.targets) - len(self.results),
+            'succeeded': succeeded,
+            'failed': len(self.results) - succeeded
+        }
+
+    def to_dict(self):
+        return {
+            **self.summary(),
+            'results': dict(self.results),
+            'pending_clients': sorted(self.targets.difference(self.results))
+        }
+
+
+class BroadcastTracker:
+    """Recent broadcasts by id, for routing agent results back to them
+
+    Only the last `history` broadcasts are kept; results for older ones are
+    still stored per client but no longer aggregated.
+    """
+
+    def __init__(self, history=100):
+        self.history = history
+        self._broadcasts = OrderedDict()  # broadcast_id -> Broadcast, oldest first
+        self._lock = threading.Lock()
+
+    def add(self, broadcast):
+        with self._lock:
+            self._broadcasts[broadcast.id] = broadcast
+            while len(self._broadcasts) > self.history:
+                self._broadcasts.popitem(last=False)
+
+    def get(self, broadcast_id):
+        with self._lock:
+            return self._broadcasts.get(broadcast_id)
+
+    def recent(self):
+        with self._lock:
+            return list(self._broadcasts.values())
+
+    def record_result(self, broadcast_id, client_id, result):
+        """Attach a client's result to its broadcast; False if the id is not a known broadcast target"""
+        with self._lock:
+            broadcast = self._broadcasts.get(broadcast_id)
+            if broadcast is None or client_id not in broadcast.targets:
+                return False
+            broadcast.results[client_id] = result
+            return True
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Compact per-agent record for the connection table"""
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(slots=True)
+class ClientRecord:
+    """State of one registered agent
+
+    Slotted, with timestamps as epoch floats and counters as ints, so a
+    heartbeat is two attribute stores and nothing has to parse a timestamp.
+    JSON (with ISO-8601 timestamps, as the dashboard expects) is produced
+    only at the API boundary by to_dict().
+    """
+    client_id: str
+    hostname: str = 'unknown'
+    os: str = 'unknown'
+    arch: str = 'unknown'
+    user: str = 'unknown'
+    pwd: str = 'unknown'
+    local_ip: str = 'unknown'
+    remote_ip: str = 'unknown'
+    tags: tuple = ()  # labels the agent registered with, for group commands
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+    status: str = 'connected'
+    command_count: int = 0
+    result_count: int = 0
+    version: int = 0  # connection table version of the last published change
+
+    def __post_init__(self):
+        if not self.first_seen:
+            self.first_seen = time.time()
+        if not self.last_seen:
+            self.last_seen = self.first_seen
+
+    def to_dict(self):
+        """JSON-ready view of the record"""
+        return {
+            'client_id': self.client_id,
+            'hostname': self.hostname,
+            'os': self.os,
+            'arch': self.arch,
+            'user': self.user,
+            'pwd': self.pwd,
+            'local_ip': self.local_ip,
+            'remote_ip': self.remote_ip,
+            'tags': list(self.tags),
+            'first_seen': datetime.fromtimestamp(self.first_seen).isoformat(),
+            'last_seen': datetime.fromtimestamp(self.last_seen).isoformat(),
+            'status': self.status,
+            'command_count': self.command_count,
+            'result_count': self.result_count
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a record from to_dict() output (e.g. persisted state)"""
+        fields = {name: data[name] for name in cls.__dataclass_fields__ if data.get(name) is not None}
+        for name in ('first_seen', 'last_seen'):
+            if isinstance(fields.get(name), str):
+                fields[name] = datetime.fromisoformat(fields[name]).timestamp()
+        if 'tags' in fields:
+            fields['tags'] = tuple(fields['tags'])
+        return cls(**fields)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Fixed-capacity connection event log with sequence numbers"""
+import threading
+
+
+class EventLog:
+    """Ring buffer of events, each stamped with a monotonically increasing seq
+
+    Appends are O(1) and overwrite the oldest slot once the buffer is full.
+    Readers ask for everything after the last seq they saw, so a dashboard
+    only downloads events it has not rendered yet.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._buffer = [None] * capacity
+        self._next_seq = 1
+        self._lock = threading.Lock()
+
+    def append(self, event):
+        """Add an event dict (stamped in place with its seq) and return the seq"""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            event['seq'] = seq
+            self._buffer[seq % self.capacity] = event
+            return seq
+
+    @property
+    def last_seq(self):
+        """Seq of the newest event (0 when empty); also the total number of events ever logged"""
+        return self._next_seq - 1
+
+    def since(self, seq, limit=None):
+        """Return (events newer than seq oldest first, truncated)
+
+        truncated is True when events after seq were already overwritten or
+        cut off by limit, i.e. the caller has a gap and should start over.
+        """
+        with self._lock:
+            oldest = max(1, self._next_seq - self.capacity)
+            start = max(seq + 1, oldest)
+            if limit is not None:
+                start = max(start, self._next_seq - limit)
+            events = [self._buffer[s % self.capacity] for s in range(start, self._next_seq)]
+        return events, start > seq + 1
+
+    def tail(self, count):
+        """The newest count events, oldest first"""
+        return self.since(self.last_seq - count)[0]
+
+    def __len__(self):
+        return min(self.last_seq, self.capacity)
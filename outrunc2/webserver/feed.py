@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Fan-out of dashboard updates to Server-Sent Events subscribers"""
+import json
+import threading
+from collections import deque
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    """One connected dashboard's queue of pending SSE frames
+
+    The queue is bounded: a subscriber that falls more than max_backlog
+    frames behind is dropped rather than buffered without limit, and is
+    expected to reconnect and start again from a fresh snapshot.
+    """
+
+    def __init__(self, max_backlog=100):
+        self.max_backlog = max_backlog
+        self.dropped = False
+        self._frames = deque()
+        self._cond = threading.Condition()
+
+    def put(self, frame):
+        with self._cond:
+            if self.dropped:
+                return
+            if len(self._frames) >= self.max_backlog:
+                self.dropped = True
+                self._frames.clear()
+            else:
+                self._frames.append(frame)
+            self._cond.notify()
+
+    def get(self, timeout):
+        """Wait up to timeout seconds; returns all pending frames ([] on timeout, None once dropped)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or self.dropped, timeout)
+            if self.dropped:
+                return None
+            frames = list(self._frames)
+            self._frames.clear()
+            return frames
+
+
+class Broadcaster:
+    """Publishes each update once, pre-encoded, to every subscriber
+
+    An update is serialized a single time no matter how many dashboards are
+    open, and an update identical to the previous one for the same event
+    name is not sent at all.
+    """
+
+    def __init__(self, max_backlog=100):
+        self.max_backlog = max_backlog
+        self._subscribers = set()
+        self._last = {}  # event name -> last frame published
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(self.max_backlog)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        """Send an update to all subscribers; returns False if it was unchanged"""
+        frame = sse_event(event, data)
+        with self._lock:
+            if self._last.get(event) == frame:
+                return False
+            self._last[event] = frame
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(frame)
+        return True
+
+    def __len__(self):
+        return len(self._subscribers)
@@ -0,0 +1,38 @@
+# Gunicorn configuration for serving the C2 dashboard in production
+#   gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Threaded workers: handlers block on docker exec, long-polls and the like,
+# so each worker needs plenty of threads. Every long-polling agent holds one
+# thread for up to LONGPOLL_MAX_WAIT seconds and every open dashboard holds
+# one for its /api/feed stream - size GUNICORN_THREADS for the number of
+# agents plus dashboard users.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '64'))
+
+# With the default memory state backend, clients, command queues, results and
+# events live in the worker's memory, so every request has to reach the same
+# process: run a single worker. STATE_BACKEND=sqlite shares them between
+# workers through a database on this host, so GUNICORN_WORKERS is honoured.
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+if workers > 1 and os.getenv('STATE_BACKEND', 'memory') != 'sqlite':
+    print(f"[!] GUNICORN_WORKERS={workers} ignored: C2 state is held in-process, using 1 worker "
+          f"(set STATE_BACKEND=sqlite to share it between workers)")
+    workers = 1
+
+# Don't preload: the app starts background threads (Docker events watcher,
+# endpoint prober, liveness sweeper) at import, and threads started in the
+# master would not survive the fork into the worker.
+preload_app = False
+
+# Long enough for a full exec timeout plus a long-poll
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '90'))
+graceful_timeout = 30
+# Agents reuse one connection; outlast the 5s poll interval so polling agents keep theirs
+keepalive = 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', None)
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
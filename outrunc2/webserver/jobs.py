@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Asynchronous jobs for long-running lab commands"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the job queue is at capacity"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job's command once the job has been cancelled"""
+
+
+JOB_FIELDS = ('job_id', 'status', 'timeout', 'created', 'started', 'finished', 'result')
+
+
+class Job:
+    """One submitted command and, once it finishes, its result"""
+
+    def __init__(self, description, timeout):
+        self.id = f"job-{uuid.uuid4().hex[:12]}"
+        self.description = description
+        self.timeout = timeout
+        self.status = 'queued'  # queued -> running -> succeeded | failed | timed_out | cancelled
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+
+    @classmethod
+    def from_dict(cls, data):
+        """A read-only copy of a job from its to_dict() record, as stored by another worker"""
+        job = cls.__new__(cls)
+        job.id = data['job_id']
+        job.description = {key: value for key, value in data.items() if key not in JOB_FIELDS}
+        job.timeout = data['timeout']
+        job.status = data['status']
+        job.created = data['created']
+        job.started = data['started']
+        job.finished = data['finished']
+        job.result = data['result']
+        job.cancel_event = threading.Event()
+        job.done_event = threading.Event()
+        if job.status not in ('queued', 'running'):
+            job.done_event.set()
+        return job
+
+    @property
+    def done(self):
+        return self.done_event.is_set()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'timeout': self.timeout,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'result': self.result,
+            **self.description
+        }
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and keeps recent ones for lookup
+
+    At most max_concurrent jobs run at once and at most max_pending may be
+    queued or running; submit() raises JobQueueFull beyond that. A job's
+    function is called as fn(cancel_event, timeout) and must return a result
+    dict; it is expected to enforce the timeout itself and to stop (raising
+    JobCancelled) when cancel_event is set.
+
+    With a store (the shared SQLiteBackend) every job's record is written
+    there as it changes, so any worker can look a job up, wait for it or
+    cancel it: jobs still run in the worker they were submitted to, which
+    checks the store for cancellations every poll_interval seconds.
+    """
+
+    def __init__(self, max_concurrent=4, max_pending=64, history=200, store=None, poll_interval=0.1):
+        self.max_pending = max_pending
+        self.history = history
+        self.poll_interval = poll_interval
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='job')
+        self._jobs = OrderedDict()  # job_id -> Job, oldest first
+        self._lock = threading.Lock()
+        if store is not None:
+            threading.Thread(target=self._watch_cancellations, name='job-cancel-watcher', daemon=True).start()
+
+    def submit(self, description, fn, timeout):
+        """Queue fn to run as a job and return the Job right away"""
+        job = Job(description, timeout)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if not j.done)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f'Job queue is full ({pending} jobs pending)')
+            self._jobs[job.id] = job
+            self._trim()
+        if self._store is not None:
+            self._store.save_job(job.to_dict(), done=False)
+            self._store.trim_jobs(self.history)
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        """A job by id (None if unknown); another worker's job comes back as a read-only copy"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self._store is not None:
+            record = self._store.job(job_id)
+            job = Job.from_dict(record) if record else None
+        return job
+
+    def wait(self, job, timeout):
+        """Block until job finishes or timeout seconds pass, and return its latest state"""
+        with self._lock:
+            local = self._jobs.get(job.id) is job
+        if local or self._store is None:
+            job.done_event.wait(timeout)
+            return job
+        # Another worker runs it: its stored record is all there is to watch
+        deadline = time.monotonic() + timeout
+        while not job.done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.poll_interval, remaining))
+            job = self.get(job.id) or job
+        return job
+
+    def recent(self):
+        """Recent jobs oldest first - every worker's with a store"""
+        if self._store is not None:
+            return [Job.from_dict(record) for record in self._store.recent_jobs()]
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job (None if unknown)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self._store is not None:
+            record = self._store.request_job_cancel(job_id)
+            return Job.from_dict(record) if record else None
+        if job is not None and not job.done:
+            job.cancel_event.set()
+        return job
+
+    def _watch_cancellations(self):
+        """Background thread: cancel this worker's jobs that another worker was asked to cancel"""
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                unfinished = {job.id: job for job in self._jobs.values() if not job.done}
+            if not unfinished:
+                continue
+            try:
+                for job_id in self._store.cancelled_jobs(unfinished):
+                    unfinished[job_id].cancel_event.set()
+            except Exception as e:
+                print(f"Warning: job cancellation watch failed: {e}")
+
+    def _save(self, job):
+        if self._store is None:
+            return
+        try:
+            self._store.save_job(job.to_dict(), done=job.status not in ('queued', 'running'))
+        except Exception as e:
+            print(f"Warning: could not store job {job.id}: {e}")
+
+    def _run(self, job, fn):
+        if job.cancel_event.is_set():
+            self._finish(job, 'cancelled', {'success': False, 'error': 'Job cancelled before it started'})
+            return
+        job.status = 'running'
+        job.started = time.time()
+        self._save(job)
+        try:
+            result = fn(job.cancel_event, job.timeout)
+        except JobCancelled:
+            self._finish(job, 'cancelled', {'success': False, 'error': 'Job cancelled'})
+            return
+        except Exception as e:
+            self._finish(job, 'failed', {'success': False, 'error': str(e)})
+            return
+
+        if job.cancel_event.is_set():
+            status = 'cancelled'
+        elif result.get('timed_out'):
+            status = 'timed_out'
+        else:
+            status = 'succeeded' if result.get('success') else 'failed'
+        self._finish(job, status, result)
+
+    def _finish(self, job, status, result):
+        job.result = result
+        job.status = status
+        job.finished = time.time()
+        self._save(job)
+        job.done_event.set()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history limit (caller holds the lock)"""
+        excess = len(self._jobs) - self.history
+        for job_id in [j.id for j in self._jobs.values() if j.done][:max(excess, 0)]:
+            del self._jobs[job_id]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Last-seen tracking for agents, ordered by when they go stale"""
+import math
+import threading
+import time
+
+
+class LivenessTracker:
+    """Timing wheel of client expiry deadlines on the monotonic clock
+
+    Each client sits in exactly one bucket (one per `resolution` seconds)
+    keyed by the tick at which it expires. A touch moves the client to a
+    later bucket in O(1); expire() walks only the ticks that have elapsed
+    since the previous sweep and returns the clients found there, so a sweep
+    costs O(elapsed ticks + expired) regardless of how many clients are live.
+    An expired client leaves the wheel until it is touched again.
+    """
+
+    def __init__(self, timeout=300, resolution=1.0):
+        self.timeout = timeout
+        self.resolution = resolution
+        self._buckets = {}  # tick -> set of client_ids expiring at that tick
+        self._tick_of = {}  # client_id -> tick it currently expires at
+        self._cursor = self._tick(time.monotonic())  # first tick not yet swept
+        self._lock = threading.Lock()
+
+    def _tick(self, at):
+        return math.ceil(at / self.resolution)
+
+    def touch(self, client_id, now=None):
+        """Record activity: the client now expires `timeout` seconds from now
+
+        A deadline the sweep has already passed is due at the next sweep - a
+        bucket behind the cursor would never be visited again.
+        """
+        tick = self._tick((time.monotonic() if now is None else now) + self.timeout)
+        with self._lock:
+            tick = max(tick, self._cursor)
+            old_tick = self._tick_of.get(client_id)
+            if old_tick == tick:
+                return
+            if old_tick is not None:
+                self._discard(client_id, old_tick)
+            self._tick_of[client_id] = tick
+            self._buckets.setdefault(tick, set()).add(client_id)
+
+    def expire(self, now=None):
+        """Return the clients whose deadline has passed and stop tracking them"""
+        # Tick t holds deadlines up to t * resolution: only ticks that have fully elapsed are due
+        current = math.floor((time.monotonic() if now is None else now) / self.resolution)
+        expired = []
+        with self._lock:
+            while self._cursor <= current:
+                for client_id in self._buckets.pop(self._cursor, ()):
+                    del self._tick_of[client_id]
+                    expired.append(client_id)
+                self._cursor += 1
+        return expired
+
+    def __contains__(self, client_id):
+        return client_id in self._tick_of
+
+    def _discard(self, client_id, tick):
+        bucket = self._buckets.get(tick)
+        if bucket is not None:
+            bucket.discard(client_id)
+            if not bucket:
+                del self._buckets[tick]
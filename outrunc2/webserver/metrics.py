@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Minimal Prometheus-style metrics (counters, histograms, gauges) and an instrumented lock"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; spans fast in-process handlers up to docker execs and long-polls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Seconds; lock waits and holds are normally microseconds
+LOCK_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1, 1)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = list(self._values.items())
+        lines.extend(f'{self.name}{_labels(self.labelnames, key)} {value}' for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [count per bucket (+Inf last), sum]
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def shard(self):
+        """A lock-free series for one writer whose observations are already serialised
+
+        Shards are merged into the unlabelled series at scrape time, so hot
+        paths don't all contend on this histogram's lock.
+        """
+        assert not self.labelnames, 'only unlabelled histograms can be sharded'
+        shard = HistogramShard(self.buckets)
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+            shards = list(self._shards)
+        if shards:
+            # Read without the writers' locks: a scrape may catch a shard between its
+            # bucket and sum updates, which the next scrape corrects
+            _, merged, total = next((v for v in values if v[0] == ()), ((), [0] * (len(self.buckets) + 1), 0.0))
+            for shard in shards:
+                merged = [a + b for a, b in zip(merged, shard.counts)]
+                total += shard.total
+            values = [v for v in values if v[0] != ()] + [((), merged, total)]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = _labels(self.labelnames + ('le',), key + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class HistogramShard:
+    """One writer's share of a Histogram; observe() must not be called concurrently"""
+
+    __slots__ = ('buckets', 'counts', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class Gauge:
+    """A value computed at scrape time: fn() returns a number, or {label value tuple: number}"""
+
+    def __init__(self, name, help, fn, labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        value = self.fn()
+        if isinstance(value, dict):
+            lines.extend(f'{self.name}{_labels(self.labelnames, key)} {v}' for key, v in value.items())
+        elif value is not None:
+            lines.append(f'{self.name} {value}')
+        return lines
+
+
+class Registry:
+    """The set of metrics exposed on /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn, labelnames=()):
+        return self._add(Gauge(name, help, fn, labelnames))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f'# {metric.name} unavailable: {e}')
+        return '\n'.join(lines) + '\n'
+
+
+class InstrumentedLock:
+    """threading.Lock that records how long callers wait for it and hold it
+
+    Usable with threading.Condition. An uncontended acquire is recorded as a
+    zero wait without touching the clock a second time. Both are recorded
+    while the lock is held, into this lock's own shard of each histogram, so
+    instrumentation adds no shared lock to the acquire/release path.
+    """
+
+    def __init__(self, wait_histogram, hold_histogram):
+        self._lock = threading.Lock()
+        self._wait = wait_histogram.shard()
+        self._hold = hold_histogram.shard()
+        self._owner = None
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            waited = 0.0
+        elif not blocking:
+            return False
+        else:
+            start = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            waited = time.perf_counter() - start
+        self._owner = threading.get_ident()
+        self._acquired_at = time.perf_counter()
+        self._wait.observe(waited)
+        return True
+
+    def release(self):
+        self._hold.observe(time.perf_counter() - self._acquired_at)
+        self._owner = None
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def _is_owned(self):
+        # Lets threading.Condition check ownership without a probing acquire
+        return self._owner == threading.get_ident()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Cache of idempotent command output per client container"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class OutputCache:
+    """Successful command results keyed by (container id, command), each with its own TTL
+
+    Keying on the container id rather than its name means a recreated
+    container never sees its predecessor's output; invalidate() drops a
+    container's entries when it restarts. At most max_entries results are
+    kept, evicting the least recently used.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (container_id, command) -> (expires_at, stored_at, result)
+        self._lock = threading.Lock()
+
+    def get(self, container_id, command):
+        """Cached result (with cached/cached_age fields added) or None"""
+        key = (container_id, command)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, stored_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return dict(result, cached=True, cached_age=round(time.time() - stored_at, 1))
+
+    def put(self, container_id, command, result, ttl):
+        with self._lock:
+            self._entries[(container_id, command)] = (time.monotonic() + ttl, time.time(), dict(result))
+            self._entries.move_to_end((container_id, command))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, container_id=None):
+        """Forget one container's cached output (every container's with no argument)"""
+        with self._lock:
+            if container_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == container_id]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""On-demand sampling profiler for live diagnosis"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval while running
+
+    Stacks are aggregated in the collapsed ("folded") format that flame graph
+    tools read: one line per distinct stack, frames root-first separated by
+    semicolons, followed by the number of samples. A run stops by itself
+    after max_duration seconds so a forgotten profiler doesn't keep costing.
+    """
+
+    def __init__(self, interval=0.01, max_duration=300):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.samples = 0
+        self.started = None
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start sampling (clearing the previous run's samples); False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks.clear()
+            self.samples = 0
+            self.started = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self):
+        """Samples so far in collapsed-stack format, most frequent first"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def status(self):
+        return {
+            'running': self.running,
+            'started': self.started,
+            'samples': self.samples,
+            'interval': self.interval,
+            'stacks': len(self._stacks)
+        }
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.max_duration
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(frames)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
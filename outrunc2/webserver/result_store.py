@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Bounded, indexed storage for command results reported by clients"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict, deque
+
+
+class ResultStore:
+    """Keeps client results within per-client, global count/byte and age limits
+
+    Every stored result gets a monotonically increasing sequence number which
+    doubles as the pagination cursor. Results are indexed by command_id so a
+    single result can be fetched directly. Eviction is always oldest-first:
+    the global insertion order is also each client's insertion order, so
+    dropping the globally oldest result is an O(1) popleft on its client.
+    """
+
+    def __init__(self, max_per_client=100, max_total=5000, max_bytes=64 * 1024 * 1024, max_age=86400):
+        self.max_per_client = max_per_client
+        self.max_total = max_total
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._by_client = defaultdict(deque)  # client_id -> deque of entries (oldest first)
+        self._by_seq = OrderedDict()  # seq -> entry, global insertion order
+        self._by_command = {}  # command_id -> entry
+        self._next_seq = 1
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, result_data):
+        """Store a result dict (must contain client_id and command_id), returning its sequence number"""
+        size = len(json.dumps(result_data, default=str))
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            entry = {'seq': seq, 'stored_at': time.time(), 'size': size, 'data': result_data}
+            self._by_client[result_data['client_id']].append(entry)
+            self._by_seq[seq] = entry
+            self._by_command[result_data['command_id']] = entry
+            self._bytes += size
+
+            client_entries = self._by_client[result_data['client_id']]
+            while len(client_entries) > self.max_per_client:
+                self._remove(client_entries[0])
+            self._evict()
+            return seq
+
+    def get(self, command_id):
+        """Look up a single result by command_id"""
+        with self._lock:
+            entry = self._by_command.get(command_id)
+            return dict(entry['data'], seq=entry['seq']) if entry else None
+
+    def page(self, client_id, cursor=None, limit=10):
+        """Return (results, next_cursor) for a client, newest page first
+
+        Results within a page are in chronological order. Pass the returned
+        next_cursor back as cursor to fetch the page of older results; it is
+        None once the oldest stored result has been returned.
+        """
+        with self._lock:
+            self._evict()
+            entries = self._by_client.get(client_id, ())
+            end = len(entries) if cursor is None else bisect_left(entries, cursor, key=lambda e: e['seq'])
+            start = max(0, end - limit)
+            page = [dict(entries[i]['data'], seq=entries[i]['seq']) for i in range(start, end)]
+            next_cursor = entries[start]['seq'] if start > 0 else None
+            return page, next_cursor
+
+    def stats(self):
+        """Current size of the store"""
+        with self._lock:
+            return {'results': len(self._by_seq), 'bytes': self._bytes, 'clients': len(self._by_client)}
+
+    def _evict(self):
+        """Drop the oldest results until the store is within its global limits"""
+        expire_before = time.time() - self.max_age
+        while self._by_seq:
+            oldest = next(iter(self._by_seq.values()))
+            if (len(self._by_seq) > self.max_total or self._bytes > self.max_bytes
+                    or oldest['stored_at'] < expire_before):
+                self._remove(oldest)
+            else:
+                break
+
+    def _remove(self, entry):
+        """Remove an entry that is the oldest stored result of its client"""
+        data = entry['data']
+        client_entries = self._by_client[data['client_id']]
+        client_entries.popleft()
+        if not client_entries:
+            del self._by_client[data['client_id']]
+        del self._by_seq[entry['seq']]
+        if self._by_command.get(data['command_id']) is entry:
+            del self._by_command[data['command_id']]
+        self._bytes -= entry['size']
+
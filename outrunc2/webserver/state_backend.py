@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+"""Coordination state (clients, command queues, results, events, broadcasts) held in-process or shared between workers"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+
+from broadcasts import Broadcast
+from client_record import ClientRecord
+
+
+class ClientUpdate:
+    """One client's record while the backend holds it for a read-modify-write
+
+    record is None for an unknown client; assign a new ClientRecord to create
+    or replace it. Mutations are written back when the update ends, and
+    publish() also gives the record a new connection table version so
+    dashboards pick the change up.
+    """
+    __slots__ = ('client_id', 'record', 'published', 'was_connected')
+
+    def __init__(self, client_id, record):
+        self.client_id = client_id
+        self.record = record
+        self.published = False
+        self.was_connected = record is not None and record.status == 'connected'
+
+    def publish(self):
+        self.published = True
+
+
+class InProcessBackend:
+    """State in this process's memory, optionally persisted through a write-behind SQLiteStorage
+
+    Per-client state is guarded by lock stripes rather than one global lock,
+    so a heartbeat only contends with requests for clients hashing to the
+    same stripe. Every published client change gets the next connection
+    table version, so dashboards can ask for just the clients changed since
+    the version they hold.
+    """
+
+    def __init__(self, results, events, broadcasts, lock_factory, stripes=64, storage=None):
+        self.results = results  # ResultStore
+        self.events = events  # EventLog
+        self.broadcasts = broadcasts  # BroadcastTracker
+        self.storage = storage
+        self._clients = {}  # client_id -> ClientRecord
+        # client_id -> deque of pending commands; a broadcast queues the same dict for every target
+        self._commands = defaultdict(deque)
+        self._stripes = [lock_factory() for _ in range(stripes)]
+        self._conditions = {}  # client_id -> condition notified when commands are queued
+        self._versions = OrderedDict()  # client_id -> version of its last change, oldest change first
+        self._version_lock = threading.Lock()
+        self.version = 0  # version of the most recent change
+        # Versions and event sequence numbers restart with the process; this tells the runs apart
+        self.epoch = os.urandom(4).hex()
+        self._active = 0  # clients with status 'connected', maintained on transitions
+
+    def _lock(self, client_id):
+        return self._stripes[hash(client_id) % len(self._stripes)]
+
+    def _condition(self, client_id):
+        condition = self._conditions.get(client_id)
+        if condition is None:
+            condition = self._conditions.setdefault(client_id, threading.Condition(self._lock(client_id)))
+        return condition
+
+    def _publish(self, record, was_connected):
+        with self._version_lock:
+            self.version += 1
+            record.version = self.version
+            self._active += (record.status == 'connected') - was_connected
+            self._versions[record.client_id] = self.version
+            self._versions.move_to_end(record.client_id)
+
+    def restore(self):
+        """Rebuild state from the storage database at startup: (clients, commands, results) restored"""
+        clients, commands, results, events = self.storage.load(max_results=self.results.max_total,
+                                                               max_events=self.events.capacity)
+        for client_id, info in clients.items():
+            record = self._clients[client_id] = ClientRecord.from_dict(info)
+            self._publish(record, was_connected=False)
+        for client_id, pending in commands.items():
+            self._commands[client_id].extend(pending)
+        for event in events:
+            self.events.append(event)
+        for result_data in results:
+            self.results.add(result_data)
+        return len(clients), sum(map(len, commands.values())), len(results)
+
+    # ---- clients ----
+
+    @contextmanager
+    def update(self, client_id):
+        """Hold a client's record (ClientUpdate) for a read-modify-write"""
+        with self._lock(client_id):
+            update = ClientUpdate(client_id, self._clients.get(client_id))
+            yield update
+            record = update.record
+            if record is None:
+                return
+            self._clients[client_id] = record
+            if update.published:
+                self._publish(record, update.was_connected)
+            if self.storage:
+                self.storage.save_client(record)
+
+    def clients(self):
+        """Every registered record; records are replaced rather than mutated on registration, so read-only use is safe"""
+        return list(self._clients.values())
+
+    def snapshot(self, client_ids=None):
+        """client_id -> to_dict() of the given (default: all) registered clients"""
+        clients = {}
+        for client_id in list(self._clients) if client_ids is None else client_ids:
+            record = self._clients.get(client_id)
+            if record is not None:
+                # Copy each record under its own stripe only
+                with self._lock(client_id):
+                    clients[client_id] = record.to_dict()
+        return clients
+
+    def changed_since(self, version):
+        """Ids of clients changed after version, found by walking back from the newest change"""
+        changed = []
+        with self._version_lock:
+            for client_id in reversed(self._versions):
+                if self._versions[client_id] <= version:
+                    break
+                changed.append(client_id)
+        return changed
+
+    def client_count(self):
+        return len(self._clients)
+
+    def active_count(self):
+        return self._active
+
+    # ---- command queues ----
+
+    def queue_command(self, client_ids, command):
+        """Queue one command dict for each client, counting it on registered clients' records"""
+        # One pass over the targets, taking each lock stripe once for all its clients
+        by_stripe = defaultdict(list)
+        for client_id in client_ids:
+            by_stripe[self._lock(client_id)].append(client_id)
+        for lock, stripe_clients in by_stripe.items():
+            with lock:
+                for client_id in stripe_clients:
+                    self._commands[client_id].append(command)
+                    record = self._clients.get(client_id)
+                    if record is not None:
+                        record.command_count += 1
+                        self._publish(record, was_connected=record.status == 'connected')
+                        if self.storage:
+                            self.storage.save_client(record)
+                    # Wake up a long-polling client
+                    self._condition(client_id).notify_all()
+        if self.storage:
+            self.storage.save_broadcast(client_ids, command)
+
+    def take_commands(self, client_id, wait=0):
+        """Remove and return a client's queued commands, first waiting up to wait seconds for one"""
+        with self._lock(client_id):
+            if wait and not self._commands.get(client_id):
+                self._condition(client_id).wait_for(lambda: self._commands.get(client_id), timeout=wait)
+            commands = list(self._commands.pop(client_id, ()))
+        if self.storage:
+            self.storage.mark_delivered(client_id, (command['id'] for command in commands))
+        return commands
+
+    def queue_depths(self):
+        return [len(pending) for pending in list(self._commands.values())]
+
+    # ---- results ----
+
+    def add_result(self, result_data):
+        self.results.add(result_data)
+        if self.storage:
+            self.storage.save_result(result_data)
+
+    def result(self, command_id):
+        return self.results.get(command_id)
+
+    def results_page(self, client_id, cursor=None, limit=10):
+        return self.results.page(client_id, cursor=cursor, limit=limit)
+
+    def result_stats(self):
+        return self.results.stats()
+
+    # ---- events ----
+
+    def add_event(self, event):
+        self.events.append(event)
+        if self.storage:
+            self.storage.save_event(event)
+
+    @property
+    def last_event_seq(self):
+        return self.events.last_seq
+
+    def events_since(self, seq):
+        return self.events.since(seq)
+
+    def events_tail(self, count):
+        return self.events.tail(count)
+
+    # ---- broadcasts ----
+
+    def add_broadcast(self, broadcast):
+        self.broadcasts.add(broadcast)
+
+    def broadcast(self, broadcast_id):
+        return self.broadcasts.get(broadcast_id)
+
+    def broadcast_summaries(self):
+        """summary() of the recent broadcasts, newest first"""
+        return [broadcast.summary() for broadcast in reversed(self.broadcasts.recent())]
+
+    def record_broadcast_result(self, broadcast_id, client_id, result):
+        self.broadcasts.record_result(broadcast_id, client_id, result)
+
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+-- Identifies this database's run of versions, in case the file is recreated
+INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ABS(RANDOM()) % 4294967296);
+CREATE TABLE IF NOT EXISTS clients (
+    client_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clients_version ON clients (version);
+CREATE TABLE IF NOT EXISTS command_queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_command_queue_client ON command_queue (client_id);
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    command_id TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_client ON results (client_id, seq);
+CREATE INDEX IF NOT EXISTS idx_results_command ON results (command_id);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS broadcasts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    broadcast_id TEXT UNIQUE NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+"""
+
+
+class SQLiteBackend:
+    """State in a SQLite (WAL mode) database shared by every worker process on the host
+
+    Each write is its own transaction, so a client update or a command claim
+    is atomic across processes: a queued command is deleted by exactly one
+    claim, whichever worker the agent's request lands on. Commands queued by
+    this worker wake its long-polls at once; a watcher thread notices those
+    queued by other workers within poll_interval seconds. Results and events
+    are trimmed to the same limits as the in-process stores.
+
+    Broadcasts keep only their targets here; their results are the rows of
+    the results table carrying the broadcast id, whichever worker stored
+    them. Job records (see JobManager) are kept for every worker to read,
+    while each job runs in the worker it was submitted to.
+    """
+
+    def __init__(self, path, lock_factory, poll_interval=0.1, max_per_client=100, max_total=5000,
+                 max_bytes=64 * 1024 * 1024, max_age=86400, event_capacity=1000, broadcast_history=100):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.max_per_client = max_per_client
+        self.max_total = max_total
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.event_capacity = event_capacity
+        self.broadcast_history = broadcast_history
+        self._pool = queue.LifoQueue()  # idle connections, reused across request threads
+        # Writers in this process queue here instead of spinning on SQLite's busy timeout
+        self._write_lock = lock_factory()
+        self._signal_lock = threading.Lock()
+        self._conditions = {}  # client_id -> condition (on _signal_lock) of its long-polls
+        self._generations = {}  # client_id -> count of times commands were queued for it
+        self._next_trim = 0
+        with self._connection() as conn:
+            conn.executescript(SHARED_SCHEMA)
+            self._queue_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM command_queue').fetchone()[0]
+            epoch = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+        # Shared by every worker, so their ETags agree
+        self.epoch = f'{epoch:08x}'
+        threading.Thread(target=self._watch_queue, name='command-queue-watcher', daemon=True).start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL only syncs at checkpoints; a crash can lose the last writes but never corrupts
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def _write(self):
+        """A write transaction, holding the database lock from the start"""
+        with self._write_lock, self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _read(self, sql, params=()):
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    # ---- clients ----
+
+    @staticmethod
+    def _encode(record):
+        return json.dumps({name: getattr(record, name) for name in ClientRecord.__dataclass_fields__})
+
+    @staticmethod
+    def _store(conn, record, publish):
+        if publish:
+            record.version = conn.execute(
+                "UPDATE meta SET value = value + 1 WHERE key = 'version' RETURNING value").fetchone()[0]
+        conn.execute('INSERT OR REPLACE INTO clients (client_id, data, status, version) VALUES (?, ?, ?, ?)',
+                     (record.client_id, SQLiteBackend._encode(record), record.status, record.version))
+
+    @contextmanager
+    def update(self, client_id):
+        """Hold a client's record (ClientUpdate) for a read-modify-write, as one transaction"""
+        with self._write() as conn:
+            row = conn.execute('SELECT data FROM clients WHERE client_id = ?', (client_id,)).fetchone()
+            update = ClientUpdate(client_id, ClientRecord.from_dict(json.loads(row[0])) if row else None)
+            yield update
+            if update.record is not None:
+                self._store(conn, update.record, update.published)
+
+    def clients(self):
+        return [ClientRecord.from_dict(json.loads(data)) for data, in self._read('SELECT data FROM clients')]
+
+    def snapshot(self, client_ids=None):
+        if client_ids is None:
+            rows = self._read('SELECT data FROM clients')
+        else:
+            rows = []
+            client_ids = list(client_ids)
+            # Stay well under SQLite's bound parameter limit
+            for start in range(0, len(client_ids), 500):
+                chunk = client_ids[start:start + 500]
+                rows += self._read(f"SELECT data FROM clients WHERE client_id IN ({','.join('?' * len(chunk))})",
+                                   chunk)
+        records = (ClientRecord.from_dict(json.loads(data)) for data, in rows)
+        return {record.client_id: record.to_dict() for record in records}
+
+    @property
+    def version(self):
+        return self._read("SELECT value FROM meta WHERE key = 'version'")[0][0]
+
+    def changed_since(self, version):
+        return [client_id for client_id, in self._read(
+            'SELECT client_id FROM clients WHERE version > ? ORDER BY version DESC', (version,))]
+
+    def client_count(self):
+        return self._read('SELECT COUNT(*) FROM clients')[0][0]
+
+    def active_count(self):
+        return self._read("SELECT COUNT(*) FROM clients WHERE status = 'connected'")[0][0]
+
+    # ---- command queues ----
+
+    def _condition(self, client_id):
+        condition = self._conditions.get(client_id)
+        if condition is None:
+            condition = self._conditions.setdefault(client_id, threading.Condition(self._signal_lock))
+        return condition
+
+    def _signal(self, client_ids):
+        """Wake this worker's long-polls for the given clients"""
+        with self._signal_lock:
+            for client_id in client_ids:
+                self._generations[client_id] = self._generations.get(client_id, 0) + 1
+                condition = self._conditions.get(client_id)
+                if condition is not None:
+                    condition.notify_all()
+
+    def _watch_queue(self):
+        """Background thread: signal clients that another worker queued commands for"""
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                rows = self._read('SELECT seq, client_id FROM command_queue WHERE seq > ? ORDER BY seq',
+                                  (self._queue_seq,))
+            except sqlite3.Error as e:
+                print(f"Warning: command queue watch failed: {e}")
+                continue
+            if rows:
+                self._queue_seq = rows[-1][0]
+                self._signal({client_id for _, client_id in rows})
+
+    def queue_command(self, client_ids, command):
+        data = json.dumps(command)
+        with self._write() as conn:
+            conn.executemany('INSERT INTO command_queue (client_id, data) VALUES (?, ?)',
+                             [(client_id, data) for client_id in client_ids])
+            for client_id in client_ids:
+                row = conn.execute('SELECT data FROM clients WHERE client_id = ?', (client_id,)).fetchone()
+                if row is not None:
+                    record = ClientRecord.from_dict(json.loads(row[0]))
+                    record.command_count += 1
+                    self._store(conn, record, publish=True)
+        self._signal(client_ids)
+
+    def _claim(self, client_id):
+        # Check before taking the write lock: most long-poll wakeups find nothing
+        if not self._read('SELECT 1 FROM command_queue WHERE client_id = ? LIMIT 1', (client_id,)):
+            return []
+        with self._write() as conn:
+            rows = conn.execute('DELETE FROM command_queue WHERE client_id = ? RETURNING seq, data',
+                                (client_id,)).fetchall()
+        return [json.loads(data) for _, data in sorted(rows)]
+
+    def take_commands(self, client_id, wait=0):
+        deadline = time.monotonic() + wait
+        while True:
+            with self._signal_lock:
+                generation = self._generations.get(client_id, 0)
+            commands = self._claim(client_id)
+            remaining = deadline - time.monotonic()
+            if commands or remaining <= 0:
+                return commands
+            condition = self._condition(client_id)
+            with self._signal_lock:
+                condition.wait_for(lambda: self._generations.get(client_id, 0) != generation, timeout=remaining)
+
+    def queue_depths(self):
+        return [count for count, in self._read('SELECT COUNT(*) FROM command_queue GROUP BY client_id')]
+
+    # ---- results ----
+
+    def add_result(self, result_data):
+        data = json.dumps(result_data, default=str)
+        now = time.time()
+        with self._write() as conn:
+            conn.execute('INSERT INTO results (command_id, client_id, data, size, stored_at) VALUES (?, ?, ?, ?, ?)',
+                         (result_data['command_id'], result_data['client_id'], data, len(data), now))
+            conn.execute('DELETE FROM results WHERE client_id = ? AND seq <= '
+                         '(SELECT seq FROM results WHERE client_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)',
+                         (result_data['client_id'], result_data['client_id'], self.max_per_client))
+            if now >= self._next_trim:
+                self._trim_results(conn, now)
+                self._next_trim = now + 1
+
+    def _trim_results(self, conn, now):
+        """Drop the oldest results until the table is within its global limits"""
+        conn.execute('DELETE FROM results WHERE stored_at < ?', (now - self.max_age,))
+        conn.execute('DELETE FROM results WHERE seq <= (SELECT seq FROM results ORDER BY seq DESC LIMIT 1 OFFSET ?)',
+                     (self.max_total,))
+        conn.execute('DELETE FROM results WHERE seq <= (SELECT seq FROM (SELECT seq, SUM(size) OVER '
+                     '(ORDER BY seq DESC) AS total FROM results) WHERE total > ? ORDER BY seq DESC LIMIT 1)',
+                     (self.max_bytes,))
+
+    def result(self, command_id):
+        rows = self._read('SELECT seq, data FROM results WHERE command_id = ? AND stored_at >= ? '
+                          'ORDER BY seq DESC LIMIT 1', (command_id, time.time() - self.max_age))
+        return dict(json.loads(rows[0][1]), seq=rows[0][0]) if rows else None
+
+    def results_page(self, client_id, cursor=None, limit=10):
+        rows = self._read('SELECT seq, data FROM results WHERE client_id = ? AND seq < ? AND stored_at >= ? '
+                          'ORDER BY seq DESC LIMIT ?',
+                          (client_id, cursor if cursor is not None else 2**63 - 1,
+                           time.time() - self.max_age, limit + 1))
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        page = [dict(json.loads(data), seq=seq) for seq, data in reversed(rows[:limit])]
+        return page, next_cursor
+
+    def result_stats(self):
+        results, size, clients = self._read(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(DISTINCT client_id) FROM results')[0]
+        return {'results': results, 'bytes': size, 'clients': clients}
+
+    # ---- events ----
+
+    def add_event(self, event):
+        with self._write() as conn:
+            event['seq'] = conn.execute('INSERT INTO events (data) VALUES (?)', (json.dumps(event),)).lastrowid
+            conn.execute('DELETE FROM events WHERE seq <= ?', (event['seq'] - self.event_capacity,))
+
+    @property
+    def last_event_seq(self):
+        rows = self._read("SELECT seq FROM sqlite_sequence WHERE name = 'events'")
+        return rows[0][0] if rows else 0
+
+    def events_since(self, seq):
+        """(events newer than seq oldest first, truncated), as EventLog.since()"""
+        last = self.last_event_seq
+        start = max(seq + 1, last - self.event_capacity + 1, 1)
+        events = [dict(json.loads(data), seq=event_seq) for event_seq, data in self._read(
+            'SELECT seq, data FROM events WHERE seq >= ? AND seq <= ? ORDER BY seq', (start, last))]
+        return events, start > seq + 1
+
+    def events_tail(self, count):
+        return self.events_since(self.last_event_seq - count)[0]
+
+    # ---- broadcasts ----
+
+    def add_broadcast(self, broadcast):
+        with self._write() as conn:
+            seq = conn.execute('INSERT INTO broadcasts (broadcast_id, data) VALUES (?, ?)',
+                               (broadcast.id, json.dumps(broadcast.to_record()))).lastrowid
+            conn.execute('DELETE FROM broadcasts WHERE seq <= ?', (seq - self.broadcast_history,))
+
+    def broadcast(self, broadcast_id):
+        rows = self._read('SELECT data FROM broadcasts WHERE broadcast_id = ?', (broadcast_id,))
+        if not rows:
+            return None
+        # Oldest first, so each client's latest result wins
+        results = {client_id: json.loads(data)['result'] for client_id, data in self._read(
+            'SELECT client_id, data FROM results WHERE command_id = ? AND stored_at >= ? ORDER BY seq',
+            (broadcast_id, time.time() - self.max_age))}
+        return Broadcast.from_record(json.loads(rows[0][0]), results)
+
+    def broadcast_summaries(self):
+        """summary() of the recent broadcasts, newest first"""
+        # Each client's latest result per broadcast (SQLite takes the bare columns from the MAX(seq) row);
+        # the success flag is all a summary needs
+        rows = self._read(
+            'SELECT b.seq, b.data, r.client_id, json_extract(r.data, \'$.result.success\'), MAX(r.seq) '
+            'FROM broadcasts b LEFT JOIN results r ON r.command_id = b.broadcast_id AND r.stored_at >= ? '
+            'GROUP BY b.seq, r.client_id ORDER BY b.seq DESC', (time.time() - self.max_age,))
+        records, results = {}, defaultdict(dict)
+        for seq, data, client_id, success, _ in rows:
+            records.setdefault(seq, data)
+            if client_id is not None:
+                results[seq][client_id] = {'success': bool(success)}
+        return [Broadcast.from_record(json.loads(data), results[seq]).summary() for seq, data in records.items()]
+
+    def record_broadcast_result(self, broadcast_id, client_id, result):
+        # Already stored by add_result under the broadcast id
+        pass
+
+    # ---- jobs ----
+
+    def save_job(self, record, done):
+        """Store a job's to_dict() record, keeping any cancellation already requested"""
+        with self._write() as conn:
+            conn.execute('INSERT INTO jobs (job_id, data, done, created) VALUES (?, ?, ?, ?) '
+                         'ON CONFLICT (job_id) DO UPDATE SET data = excluded.data, done = excluded.done',
+                         (record['job_id'], json.dumps(record, default=str), int(done), record['created']))
+
+    def trim_jobs(self, history):
+        """Forget the oldest finished jobs beyond the history limit"""
+        with self._write() as conn:
+            excess = conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] - history
+            if excess > 0:
+                conn.execute('DELETE FROM jobs WHERE job_id IN '
+                             '(SELECT job_id FROM jobs WHERE done ORDER BY created LIMIT ?)', (excess,))
+
+    def job(self, job_id):
+        rows = self._read('SELECT data FROM jobs WHERE job_id = ?', (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def recent_jobs(self):
+        """Job records, oldest first"""
+        return [json.loads(data) for data, in self._read('SELECT data FROM jobs ORDER BY created')]
+
+    def request_job_cancel(self, job_id):
+        """Flag an unfinished job for its worker to cancel; returns its record (None if unknown)"""
+        with self._write() as conn:
+            conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND NOT done', (job_id,))
+            row = conn.execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cancelled_jobs(self, job_ids):
+        """The given unfinished jobs that a cancellation was requested for"""
+        job_ids = list(job_ids)
+        return {job_id for job_id, in self._read(
+            f"SELECT job_id FROM jobs WHERE cancel_requested AND NOT done AND job_id IN ({','.join('?' * len(job_ids))})",
+            job_ids)}
@@ -24,15 +24,35 @@ class OutrunTerminal {
         this.activeClients = document.getElementById('activeClients');
         this.totalEvents = document.getElementById('totalEvents');
         
+        // Incremental event feed: last seen event sequence number and the events on screen
+        this.eventSeq = null;
+        this.recentEvents = [];
+        
+        // Incremental client table: version and ETag of the last /api/connections
+        // response we applied, and the clients it left us with
+        this.clientsVersion = null;
+        this.connectionsEtag = null;
+        this.clients = {};
+        
+        // Live dashboard feed (null when falling back to polling)
+        this.feed = null;
+        
         this.init();
     }
     
     init() {
+        this.setupEventListeners();
+        
+        // One server-pushed feed updates every panel; poll only where EventSource is missing
+        if (window.EventSource) {
+            this.subscribeFeed();
+            return;
+        }
+        
         this.loadSystemInfo();
         this.loadNetworkStatus();
         this.loadClientStatus();
         this.loadConnectionMonitor();
-        this.setupEventListeners();
         
         // Auto-refresh intervals
         setInterval(() => {
@@ -47,6 +67,16 @@ class OutrunTerminal {
         }, 5000);
     }
     
+    subscribeFeed() {
+        // The feed opens with a snapshot of every panel (also after an automatic reconnect)
+        this.feed = new EventSource('/api/feed');
+        this.feed.addEventListener('system', (e) => this.renderSystemInfo(JSON.parse(e.data)));
+        this.feed.addEventListener('network', (e) => this.renderNetworkStatus(JSON.parse(e.data)));
+        this.feed.addEventListener('clients', (e) => this.renderClientStatus(JSON.parse(e.data)));
+        this.feed.addEventListener('connections', (e) => this.applyConnections(JSON.parse(e.data)));
+        this.feed.onerror = () => console.error('Dashboard feed interrupted, reconnecting');
+    }
+    
     setupEventListeners() {
         // Server terminal events
         this.executeBtn.addEventListener('click', () => this.executeCommand());
@@ -76,91 +106,97 @@ class OutrunTerminal {
     async loadSystemInfo() {
         try {
             const response = await fetch('/api/system');
-            const data = await response.json();
-            
-            if (data.error) {
-                this.systemInfo.innerHTML = `<div class="error">Error: ${data.error}</div>`;
-                return;
-            }
-            
-            const html = `
-                <div class="system-data">
-                    <div><strong>Hostname:</strong> ${data.hostname}</div>
-                    <div><strong>Timestamp:</strong> ${new Date(data.timestamp).toLocaleString()}</div>
-                    <div><strong>Uptime:</strong></div>
-                    <pre>${data.uptime}</pre>
-                </div>
-            `;
-            this.systemInfo.innerHTML = html;
+            this.renderSystemInfo(await response.json());
         } catch (error) {
             this.systemInfo.innerHTML = `<div class="error">Failed to load system info: ${error.message}</div>`;
         }
     }
     
+    renderSystemInfo(data) {
+        if (data.error) {
+            this.systemInfo.innerHTML = `<div class="error">Error: ${data.error}</div>`;
+            return;
+        }
+        
+        const html = `
+            <div class="system-data">
+                <div><strong>Hostname:</strong> ${data.hostname}</div>
+                <div><strong>Timestamp:</strong> ${new Date(data.timestamp).toLocaleString()}</div>
+                <div><strong>Uptime:</strong></div>
+                <pre>${data.uptime}</pre>
+            </div>
+        `;
+        this.systemInfo.innerHTML = html;
+    }
+    
     async loadNetworkStatus() {
         try {
             const response = await fetch('/api/network');
-            const data = await response.json();
-            
-            let html = '<div class="endpoints">';
-            
-            Object.entries(data).forEach(([endpoint, result]) => {
-                const status = result.success ? 'online' : 'offline';
-                const statusText = result.success ? 'ONLINE' : 'OFFLINE';
-                
-                html += `
-                    <div class="endpoint ${status}">
-                        <div class="endpoint-header">
-                            ${endpoint} - ${statusText}
-                        </div>
-                        <div class="endpoint-details">
-                            <pre>${result.output}</pre>
-                        </div>
-                    </div>
-                `;
-            });
-            
-            html += '</div>';
-            this.networkStatus.innerHTML = html;
+            this.renderNetworkStatus(await response.json());
         } catch (error) {
             this.networkStatus.innerHTML = `<div class="error">Failed to load network status: ${error.message}</div>`;
         }
     }
+    
+    renderNetworkStatus(data) {
+        let html = '<div class="endpoints">';
+        
+        Object.entries(data).forEach(([endpoint, result]) => {
+            const status = result.success ? 'online' : 'offline';
+            const statusText = result.success ? 'ONLINE' : 'OFFLINE';
+            
+            html += `
+                <div class="endpoint ${status}">
+                    <div class="endpoint-header">
+                        ${endpoint} - ${statusText}
+                    </div>
+                    <div class="endpoint-details">
+                        <pre>${result.output}</pre>
+                    </div>
+                </div>
+            `;
+        });
+        
+        html += '</div>';
+        this.networkStatus.innerHTML = html;
+    }
 
     async loadClientStatus() {
         try {
             const response = await fetch('/api/clients');
-            const data = await response.json();
-            
-            if (data.error) {
-                this.clientStatus.innerHTML = `<div class="error">Error: ${data.error}</div>`;
-                return;
-            }
-            
-            let html = '<div class="client-info">';
-            
-            Object.entries(data).forEach(([clientName, info]) => {
-                const statusClass = info.running ? 'online' : 'offline';
-                const statusText = info.running ? 'ONLINE' : 'OFFLINE';
-                
-                html += `
-                    <div class="client-item ${statusClass}">
-                        <div class="client-name">${clientName.toUpperCase()}</div>
-                        <div class="client-details">
-                            Status: ${statusText}<br>
-                            Container: ${info.container_name}<br>
-                            IP: ${info.ip_address}
-                        </div>
-                    </div>
-                `;
-            });
-            
-            html += '</div>';
-            this.clientStatus.innerHTML = html;
+            this.renderClientStatus(await response.json());
         } catch (error) {
             this.clientStatus.innerHTML = `<div class="error">Failed to load client status: ${error.message}</div>`;
         }
     }
+    
+    renderClientStatus(data) {
+        if (data.error) {
+            this.clientStatus.innerHTML = `<div class="error">Error: ${data.error}</div>`;
+            return;
+        }
+        
+        let html = '<div class="client-info">';
+        
+        Object.entries(data).forEach(([clientName, info]) => {
+            const statusClass = info.running ? 'online' : 'offline';
+            const statusText = info.running ? 'ONLINE' : 'OFFLINE';
+            
+            html += `
+                <div class="client-item ${statusClass}">
+                    <div class="client-name">${clientName.toUpperCase()}</div>
+                    <div class="client-details">
+                        Status: ${statusText}<br>
+                        Container: ${info.container_name}<br>
+                        IP: ${info.ip_address}
+                    </div>
+                </div>
+            `;
+        });
+        
+        html += '</div>';
+        this.clientStatus.innerHTML = html;
+    }
 
     async executeOnAllClients() {
         const command = this.clientCommandSelect.value;
@@ -175,12 +211,36 @@ class OutrunTerminal {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ command })
+                // Have the server collapse identical outputs, with diffs for the outliers
+                body: JSON.stringify({ command, aggregate: true, diff: true })
             });
             
             const data = await response.json();
             
-            if (data.results) {
+            if (data.groups) {
+                data.groups.forEach((group, index) => {
+                    const clients = group.clients.map(name => name.toUpperCase()).join(', ');
+                    const result = group.result;
+                    if (result.success) {
+                        this.addClientLine(`[${clients}] Success (${group.count}):`, 'success-header');
+                    } else {
+                        this.addClientLine(`[${clients}] Error (${group.count}):`, 'error-header');
+                    }
+                    if (index > 0 && group.diff) {
+                        // Outlier group: show only how it differs from the common output
+                        this.addClientLine(group.diff, 'warning-output');
+                    } else if (result.success) {
+                        if (result.stdout) {
+                            this.addClientLine(result.stdout, 'success-output');
+                        }
+                        if (result.stderr) {
+                            this.addClientLine(`stderr: ${result.stderr}`, 'warning-output');
+                        }
+                    } else {
+                        this.addClientLine(result.error, 'error-output');
+                    }
+                });
+            } else if (data.results) {
                 Object.entries(data.results).forEach(([clientName, result]) => {
                     if (result.success) {
                         this.addClientLine(`[${clientName.toUpperCase()}] Success:`, 'success-header');
@@ -209,45 +269,59 @@ class OutrunTerminal {
         this.clientOutput.scrollTop = this.clientOutput.scrollHeight;
     }
 
-    async executeOnClient(clientName) {
+    executeOnClient(clientName) {
         const command = this.clientCommandSelect.value;
         if (!command) return;
         
         // Add command to client output
         this.addClientLine(`c2@malformed:~$ Executing "${command}" on ${clientName.toUpperCase()}`, 'command');
         
-        try {
-            const response = await fetch(`/api/clients/${clientName}/execute`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ command })
-            });
-            
-            const data = await response.json();
-            
-            if (data.success) {
-                this.addClientLine(`[${clientName.toUpperCase()}] Success:`, 'success-header');
-                if (data.stdout) {
-                    this.addClientLine(data.stdout, 'success-output');
-                }
-                if (data.stderr) {
-                    this.addClientLine(`stderr: ${data.stderr}`, 'warning-output');
-                }
+        // Stream output over Server-Sent Events so lines render as the command produces them
+        const url = `/api/clients/${encodeURIComponent(clientName)}/execute/stream?command=${encodeURIComponent(command)}`;
+        const source = new EventSource(url);
+        let finished = false;
+        const finish = () => {
+            finished = true;
+            source.close();
+            this.clientOutput.scrollTop = this.clientOutput.scrollHeight;
+        };
+        const appendLine = (text, type) => {
+            this.addClientLine(text, type);
+            this.clientOutput.scrollTop = this.clientOutput.scrollHeight;
+        };
+        
+        appendLine(`[${clientName.toUpperCase()}] Output:`, 'success-header');
+        
+        source.addEventListener('stdout', (e) => appendLine(JSON.parse(e.data), 'success-output'));
+        source.addEventListener('stderr', (e) => appendLine(`stderr: ${JSON.parse(e.data)}`, 'warning-output'));
+        source.addEventListener('truncated', (e) => {
+            appendLine(`Output truncated after ${JSON.parse(e.data).max_bytes} bytes`, 'warning-output');
+            finish();
+        });
+        source.addEventListener('exit', (e) => {
+            const exitCode = JSON.parse(e.data).exit_code;
+            if (exitCode === 0) {
+                appendLine(`[${clientName.toUpperCase()}] Success`, 'success-header');
             } else {
-                this.addClientLine(`[${clientName.toUpperCase()}] Error:`, 'error-header');
-                this.addClientLine(data.error, 'error-output');
+                appendLine(`[${clientName.toUpperCase()}] Exited with code ${exitCode}`, 'error-header');
             }
-        } catch (error) {
-            this.addClientLine(`Network error: ${error.message}`, 'error-output');
-        }
+            finish();
+        });
+        source.addEventListener('failure', (e) => {
+            appendLine(`[${clientName.toUpperCase()}] Error:`, 'error-header');
+            appendLine(JSON.parse(e.data).error, 'error-output');
+            finish();
+        });
+        // Connection-level errors (EventSource would otherwise keep reconnecting)
+        source.onerror = () => {
+            if (!finished) {
+                appendLine('Network error: output stream closed', 'error-output');
+                finish();
+            }
+        };
         
         // Clear selection
         this.clientCommandSelect.value = '';
-        
-        // Scroll to bottom
-        this.clientOutput.scrollTop = this.clientOutput.scrollHeight;
     }
 
     addClientLine(text, type = 'output') {
@@ -337,7 +411,15 @@ class OutrunTerminal {
 
     async loadConnectionMonitor() {
         try {
-            const response = await fetch('/api/connections');
+            // Only download clients changed and events added since the last response
+            const params = new URLSearchParams();
+            if (this.clientsVersion !== null) params.set('since', this.clientsVersion);
+            if (this.eventSeq !== null) params.set('events_since', this.eventSeq);
+            const headers = this.connectionsEtag ? { 'If-None-Match': this.connectionsEtag } : {};
+            const response = await fetch(`/api/connections?${params}`, { headers, cache: 'no-store' });
+            if (response.status === 304) {
+                return; // Nothing changed since the last response
+            }
             const data = await response.json();
             
             if (!data.success) {
@@ -345,19 +427,34 @@ class OutrunTerminal {
                 return;
             }
             
-            // Update connection statistics
-            this.updateConnectionStats(data);
-            
-            // Update connected clients display
-            this.updateConnectedClients(data.clients);
-            
-            // Update events log
-            this.updateEventsLog(data.events);
+            this.connectionsEtag = response.headers.get('ETag');
+            this.applyConnections(data);
             
         } catch (error) {
             console.error('Connection monitor error:', error);
         }
     }
+    
+    applyConnections(data) {
+        // Update connection statistics
+        this.updateConnectionStats(data);
+        
+        // Apply the client delta (or replace the table on a full response)
+        this.clients = data.full ? data.clients : Object.assign(this.clients, data.clients);
+        this.clientsVersion = data.version;
+        this.updateConnectedClients(this.clients);
+        
+        // Merge new events into the log (start over on a snapshot, or if the server
+        // dropped some we missed); skip any we already have
+        if (data.full || data.events_truncated) {
+            this.recentEvents = [];
+        }
+        const lastSeq = this.recentEvents.length ? this.recentEvents[this.recentEvents.length - 1].seq : 0;
+        const events = (data.events || []).filter(event => event.seq > lastSeq);
+        this.recentEvents = this.recentEvents.concat(events).slice(-20);
+        this.eventSeq = data.event_seq;
+        this.updateEventsLog(this.recentEvents);
+    }
 
     updateConnectionStats(data) {
         if (this.totalClients) {
@@ -413,7 +510,7 @@ class OutrunTerminal {
         }
         
         let html = '';
-        events.reverse().forEach(event => {
+        events.slice().reverse().forEach(event => {
             const timestamp = new Date(event.timestamp).toLocaleTimeString();
             
             html += `
@@ -445,8 +542,10 @@ class OutrunTerminal {
             
             if (result.success) {
                 this.addClientLine(`Command sent to ${clientId}: ${command}`, 'command');
-                // Trigger immediate refresh of connection monitor
-                setTimeout(() => this.loadConnectionMonitor(), 500);
+                // Trigger immediate refresh of connection monitor (the feed pushes it otherwise)
+                if (!this.feed) {
+                    setTimeout(() => this.loadConnectionMonitor(), 500);
+                }
             } else {
                 this.addClientLine(`Error sending command to ${clientId}: ${result.error}`, 'error');
             }
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Optional durable storage for C2 state (clients, commands, results, events)"""
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    client_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS commands (
+    command_id TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    delivered INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (command_id, client_id)
+);
+CREATE INDEX IF NOT EXISTS idx_commands_client ON commands (client_id, delivered);
+CREATE INDEX IF NOT EXISTS idx_commands_timestamp ON commands (timestamp);
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    command_id TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_client ON results (client_id);
+CREATE INDEX IF NOT EXISTS idx_results_command ON results (command_id);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results (timestamp);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id TEXT,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_client ON events (client_id);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp);
+"""
+
+
+class SQLiteStorage:
+    """SQLite (WAL mode) persistence with write-behind batching
+
+    Request handlers only enqueue writes; a single writer thread commits them
+    in batches every flush_interval seconds (or batch_size writes), so hot
+    paths like heartbeats never wait on the disk. Repeated upserts of the
+    same client within a batch collapse into one row write.
+    """
+
+    def __init__(self, path, flush_interval=1.0, batch_size=500, retention=86400):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self._queue = queue.Queue()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL only syncs at checkpoints; a crash can lose the last batch but never corrupts
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn_lock = threading.Lock()
+        self._last_prune = 0
+        self._writer = threading.Thread(target=self._write_loop, name='sqlite-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # ---- write-behind API (called from request handlers) ----
+
+    def save_client(self, client):
+        # client is a live ClientRecord; it is serialized by the writer, so a
+        # burst of heartbeats costs one to_dict() per batch rather than per request
+        self._queue.put(('client', client))
+
+    def save_broadcast(self, client_ids, command):
+        # One queue entry for the whole group; the writer expands it into a row per client
+        self._queue.put(('broadcast', (list(client_ids), dict(command))))
+
+    def mark_delivered(self, client_id, command_ids):
+        command_ids = list(command_ids)
+        if command_ids:
+            self._queue.put(('delivered', (client_id, command_ids)))
+
+    def save_result(self, result_data):
+        self._queue.put(('result', dict(result_data)))
+
+    def save_event(self, event):
+        self._queue.put(('event', dict(event)))
+
+    def pending(self):
+        """Writes queued for the writer thread and not yet committed"""
+        return self._queue.qsize()
+
+    # ---- startup restore ----
+
+    def load(self, max_results=5000, max_events=100):
+        """Read back persisted state: (clients, pending commands per client, results, events)"""
+        with self._conn_lock:
+            clients = {row[0]: json.loads(row[1]) for row in self._conn.execute(
+                'SELECT client_id, data FROM clients')}
+            commands = {}
+            for client_id, data in self._conn.execute(
+                    'SELECT client_id, data FROM commands WHERE delivered = 0 ORDER BY timestamp'):
+                commands.setdefault(client_id, []).append(json.loads(data))
+            results = [json.loads(row[0]) for row in self._conn.execute(
+                'SELECT data FROM results ORDER BY seq DESC LIMIT ?', (max_results,))][::-1]
+            events = [json.loads(row[0]) for row in self._conn.execute(
+                'SELECT data FROM events ORDER BY id DESC LIMIT ?', (max_events,))][::-1]
+        return clients, commands, results, events
+
+    # ---- writer thread ----
+
+    def flush(self):
+        """Block until everything queued so far has been written"""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        done.wait()
+
+    def close(self):
+        if self._writer.is_alive():
+            self.flush()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] != 'flush':
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Warning: failed to persist {len(batch)} state changes: {e}")
+            for kind, payload in batch:
+                if kind == 'flush':
+                    payload.set()
+
+    def _write_batch(self, batch):
+        now = time.time()
+        clients = {}
+        commands, delivered, results, events = [], [], [], []
+        for kind, payload in batch:
+            if kind == 'client':
+                clients[payload.client_id] = payload
+            elif kind == 'broadcast':
+                client_ids, command = payload
+                data = json.dumps(command)
+                commands.extend((command['id'], client_id, data, now) for client_id in client_ids)
+            elif kind == 'delivered':
+                client_id, command_ids = payload
+                delivered.extend((command_id, client_id) for command_id in command_ids)
+            elif kind == 'result':
+                results.append((payload['command_id'], payload['client_id'], json.dumps(payload), now))
+            elif kind == 'event':
+                events.append((payload.get('client_id'), payload['type'], json.dumps(payload), now))
+
+        with self._conn_lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO clients (client_id, data, updated_at) VALUES (?, ?, ?)',
+                    [(client_id, json.dumps(client.to_dict()), now) for client_id, client in clients.items()])
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO commands (command_id, client_id, data, timestamp) VALUES (?, ?, ?, ?)',
+                    commands)
+                self._conn.executemany('UPDATE commands SET delivered = 1 WHERE command_id = ? AND client_id = ?',
+                                       delivered)
+                self._conn.executemany(
+                    'INSERT INTO results (command_id, client_id, data, timestamp) VALUES (?, ?, ?, ?)', results)
+                self._conn.executemany(
+                    'INSERT INTO events (client_id, type, data, timestamp) VALUES (?, ?, ?, ?)', events)
+                if now - self._last_prune > 3600:
+                    self._prune(now - self.retention)
+                    self._last_prune = now
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _prune(self, before):
+        """Drop history older than the retention window"""
+        self._conn.execute('DELETE FROM results WHERE timestamp < ?', (before,))
+        self._conn.execute('DELETE FROM events WHERE timestamp < ?', (before,))
+        self._conn.execute('DELETE FROM commands WHERE delivered = 1 AND timestamp < ?', (before,))
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The app reads its configuration at import: short timeouts keep the sweep tests quick,
+# and no background probing of lab hosts
+os.environ.setdefault('CLIENT_TIMEOUT', '2')
+os.environ.setdefault('SWEEP_INTERVAL', '0.5')
+os.environ.setdefault('PROBE_INTERVAL', '3600')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+import time
+
+from liveness import LivenessTracker
+
+
+def test_expire_waits_for_the_deadline():
+    tracker = LivenessTracker(timeout=10)
+    now = time.monotonic()
+    tracker.touch('a', now=now)
+
+    assert tracker.expire(now=now + 9.5) == []
+    assert 'a' in tracker
+    assert tracker.expire(now=now + 11) == ['a']
+    assert 'a' not in tracker
+
+
+def test_touch_behind_the_cursor_expires_at_the_next_sweep():
+    tracker = LivenessTracker(timeout=10)
+    now = time.monotonic()
+    tracker.expire(now=now + 20)
+    # A deadline the sweep has already passed
+    tracker.touch('a', now=now)
+
+    assert tracker.expire(now=now + 21) == ['a']
+
+
+def test_sweep_disconnects_a_client_seen_through_another_worker():
+    import app
+
+    client = app.app.test_client()
+    client.post('/api/checkin', json={'client_id': 'sweep-test', 'hostname': 'h'})
+    # Contact through another worker moves last_seen on without touching this process's tracker
+    with app.state.update('sweep-test') as update:
+        update.record.last_seen = time.time() + 0.3
+
+    deadline = time.monotonic() + app.CLIENT_TIMEOUT + 3 * app.SWEEP_INTERVAL + 1
+    while time.monotonic() < deadline:
+        app.sweep_stale_clients()
+        if app.state.snapshot(['sweep-test'])['sweep-test']['status'] == 'disconnected':
+            break
+        time.sleep(0.1)
+
+    assert app.state.snapshot(['sweep-test'])['sweep-test']['status'] == 'disconnected'
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Time-bounded memoization for the server's get_* helpers"""
+import functools
+import threading
+import time
+
+
+def ttl_cache(ttl):
+    """Decorator caching a function's result per argument tuple for ttl seconds
+
+    Concurrent callers that miss on the same arguments wait for a single
+    computation instead of each running it. The wrapper gets invalidate(),
+    which drops every cached entry so the next call recomputes.
+    """
+    def decorator(fn):
+        entries = {}  # args -> (expires_at, value)
+        pending = {}  # args -> Event set when an in-flight computation finishes
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            while True:
+                with lock:
+                    entry = entries.get(args)
+                    if entry is not None and entry[0] > time.monotonic():
+                        return entry[1]
+                    in_flight = pending.get(args)
+                    if in_flight is None:
+                        in_flight = pending[args] = threading.Event()
+                        break
+                in_flight.wait()
+            try:
+                value = fn(*args)
+                with lock:
+                    entries[args] = (time.monotonic() + ttl, value)
+                return value
+            finally:
+                with lock:
+                    del pending[args]
+                in_flight.set()
+
+        def invalidate():
+            with lock:
+                entries.clear()
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator